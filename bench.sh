@@ -0,0 +1,3 @@
+#!/bin/bash
+
+python3 bench/stages.py --out bench_output.txt "$@"
@@ -0,0 +1,116 @@
+# Compares the single-scan block parser (blocks.parse_block) against the
+# previous classify-then-split path on list-heavy documents. Prints one JSON
+# object per document size.
+#
+#   python3 bench/bench_blocks.py [--blocks 2000,20000]
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from textnode import BlockType as B
+from blocks import parse_block
+
+
+# The block handling as it was before blocks.py: classification splits the
+# block once per candidate type, then item extraction splits it again.
+def legacy_block_to_block_type(block: str):
+    if re.match(r"#{1,6} .*", block):
+        return B.HEADING
+    if block[:3] == '```' and block[-3:] == "```":
+        return B.CODE
+    quote_block = True
+    for line in block.split("\n"):
+        if not(line) or line[0] != ">":
+            quote_block = False
+            break
+    if quote_block:
+        return B.QUOTE
+    ul_block = True
+    for line in block.split("\n"):
+        if len(line)<2 or line[:2] != "- ":
+            ul_block = False
+            break
+    if ul_block:
+        return B.UNORDERED_LIST
+    ol_block = True
+    for line in block.split("\n"):
+        if len(line)<3 or not(re.match(r"\d\. ", line)):
+            ol_block = False
+            break
+    if ol_block:
+        return B.ORDERED_LIST
+    return B.PARAGRAPH
+
+
+def legacy_parse(block: str):
+    blocktype = legacy_block_to_block_type(block)
+    match(blocktype):
+        case (B.HEADING):
+            header = re.match(r"#{1,6} ", block)
+            return blocktype, [block[header.span()[1]:]]
+        case (B.CODE):
+            return blocktype, [block[4:-3]]
+        case (B.QUOTE):
+            return blocktype, [re.sub('>', '', block).strip()]
+        case (B.UNORDERED_LIST):
+            return blocktype, [line[2:] for line in block.split("\n")]
+        case (B.ORDERED_LIST):
+            return blocktype, [re.match(r"(\d* )(.*)", line.strip()[2:]).group(2) for line in block.split("\n")]
+        case (B.PARAGRAPH):
+            return blocktype, [" ".join(block.split("\n"))]
+
+
+def list_heavy_blocks(n: int, rng: random.Random) -> list[str]:
+    blocks = []
+    for i in range(n):
+        kind = rng.random()
+        items = rng.randint(3, 30)
+        if kind < 0.45:
+            blocks.append("\n".join(f"- item {j} of list {i} with **bold** text" for j in range(items)))
+        elif kind < 0.8:
+            blocks.append("\n".join(f"{j % 9 + 1}. step {j} of list {i}" for j in range(items)))
+        elif kind < 0.9:
+            # a list that turns into a paragraph on its last line
+            blocks.append("\n".join(f"- almost {j}" for j in range(items)) + "\nnot an item")
+        else:
+            blocks.append(f"A paragraph {i}\nover two lines")
+    return blocks
+
+
+def best_of(fn, blocks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = [fn(b) for b in blocks]
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--blocks", default="2000,20000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    for n in [int(s) for s in args.blocks.split(",")]:
+        blocks = list_heavy_blocks(n, random.Random(n))
+        legacy, expected = best_of(legacy_parse, blocks, args.repeat)
+        single, parsed = best_of(parse_block, blocks, args.repeat)
+        same = [(p.block_type, p.items) for p in parsed] == expected
+        print(json.dumps({
+            "blocks": n,
+            "lines": sum(b.count("\n") + 1 for b in blocks),
+            "legacy_s": round(legacy, 6),
+            "single_scan_s": round(single, 6),
+            "speedup": round(legacy / single, 2),
+            "same_output": same,
+        }))
+
+
+if __name__ == "__main__":
+    main()
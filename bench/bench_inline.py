@@ -0,0 +1,74 @@
+# Compares the single-pass inline tokenizer with the original five-pass
+# split pipeline on adversarial paragraphs. Prints one JSON object per case.
+# The old pipeline is quadratic on some cases, so it is skipped (multipass_s
+# and speedup null) above a case's BASELINE_MAX_N unless --full-baseline is
+# given.
+#
+#   python3 bench/bench_inline.py [--sizes 250,1000,4000] [--full-baseline]
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from convert import text_to_text_nodes_multipass
+from inline import tokenize_inline
+
+
+CASES = {
+    # every link forces the old pipeline to re-split the rest of the paragraph
+    "links": lambda n: " ".join(f"[link {i}](https://example.com/{i})" for i in range(n)),
+    "images": lambda n: " ".join(f"![img {i}](/images/{i}.png)" for i in range(n)),
+    "mixed": lambda n: " ".join(f"**b{i}** _i{i}_ `c{i}` [l{i}](/u/{i})" for i in range(n)),
+    # openers that never close
+    "brackets": lambda n: "[" * (n * 20) + "](" * n,
+}
+# sizes past which the old pipeline takes minutes
+BASELINE_MAX_N = {"brackets": 1000}
+SAMPLE_S = 0.05
+
+
+# Seconds per call, the best of repeat samples. Each sample makes enough calls
+# to last SAMPLE_S, so sub-millisecond cases are not just timer noise.
+def best_of(fn, text, repeat):
+    start = time.perf_counter()
+    result = fn(text)
+    calls = max(1, int(SAMPLE_S / max(time.perf_counter() - start, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn(text)
+        best = min(best, (time.perf_counter() - start) / calls)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="250,1000,4000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--full-baseline", action="store_true",
+                        help="time the old pipeline at every size, however long it takes")
+    args = parser.parse_args()
+    for case, make in CASES.items():
+        for n in [int(s) for s in args.sizes.split(",")]:
+            text = make(n)
+            single, actual = best_of(tokenize_inline, text, args.repeat)
+            multipass = expected = None
+            if args.full_baseline or n <= BASELINE_MAX_N.get(case, n):
+                multipass, expected = best_of(text_to_text_nodes_multipass, text, args.repeat)
+            print(json.dumps({
+                "case": case,
+                "n": n,
+                "chars": len(text),
+                "multipass_s": round(multipass, 6) if multipass is not None else None,
+                "single_pass_s": round(single, 6),
+                "speedup": round(multipass / single, 2) if multipass is not None and single else None,
+                "same_output": actual == expected if expected is not None else None,
+            }))
+
+
+if __name__ == "__main__":
+    main()
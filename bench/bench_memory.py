@@ -0,0 +1,73 @@
+# Peak RSS of whole builds (src/main.py, in a child process) over synthetic
+# sites of growing size, with and without --memory-budget. The budgeted build
+# should stay flat; exits 1 if its peak grows by more than --max-growth
+# between the smallest and the largest site. Prints one JSON object.
+#
+#   python3 bench/bench_memory.py [--sizes 1000,10000,100000] [--budget 256]
+#   python3 bench/bench_memory.py --sizes 1000,1000000 --modes budget
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(HERE, "..", "src", "main.py")
+
+from corpus import add_config_arguments, config_from_args, generate_site
+
+
+# Runs one build in root and returns (seconds, peak RSS in bytes) of it alone,
+# whatever other children ran before.
+def run(root: str, flags: list[str]) -> tuple[float, int]:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, MAIN, "/"] + flags, cwd=root,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.exit(f"build in {root} failed:\n{proc.stderr.read().decode()}")
+    # kilobytes on Linux, bytes on macOS
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak build memory as the site grows")
+    add_config_arguments(parser)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma separated page counts to build")
+    parser.add_argument("--modes", default="plain,budget", help="plain and/or budget")
+    parser.add_argument("--budget", type=int, default=256, help="--memory-budget for budgeted builds, in MB")
+    parser.add_argument("--max-growth", type=float, default=0.25,
+                        help="allowed growth of the budgeted peak from the smallest site to the largest")
+    parser.set_defaults(page_size=512)
+    args = parser.parse_args()
+    modes = {
+        "plain": ["--no-content-cache"],
+        "budget": ["--no-content-cache", "--memory-budget", str(args.budget)],
+    }
+
+    results = []
+    for pages in [int(n) for n in args.sizes.split(",")]:
+        args.pages = pages
+        config = config_from_args(args)
+        with tempfile.TemporaryDirectory() as tmp:
+            generate_site(tmp, config)
+            for mode in args.modes.split(","):
+                elapsed, peak = run(tmp, modes[mode])
+                results.append({"pages": pages, "mode": mode, "total_s": round(elapsed, 2),
+                                "peak_rss_mb": round(peak / (1 << 20), 1)})
+
+    budgeted = [r["peak_rss_mb"] for r in results if r["mode"] == "budget"]
+    growth = budgeted[-1] / budgeted[0] - 1 if budgeted else 0.0
+    print(json.dumps({"config": config.to_dict(), "budget_mb": args.budget, "runs": results,
+                      "budget_growth": round(growth, 3)}, indent=1))
+    if growth > args.max_growth:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Builds the AST for a large synthetic markdown document and reports how many
+# nodes it holds and what they cost in memory. Prints one JSON object.
+#
+#   python3 bench/bench_nodes.py [--mb 4]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import convert
+from convert import markdown_to_html_node
+from corpus import CorpusConfig, generate_markdown
+from profiling import count_nodes
+
+
+# What the same node would cost as an ordinary dict-backed object.
+class _DictNode:
+    def __init__(self):
+        self.tag = None
+        self.value = None
+        self.children = None
+        self.props = None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=4)
+    args = parser.parse_args()
+    config = CorpusConfig(page_size=int(args.mb * 1024 * 1024))
+    markdown = generate_markdown(random.Random(config.seed), config, "Synthetic")
+
+    # the inline cache is shared by the whole process; switched off, its
+    # entries are not counted as part of the AST
+    convert.inline_cache.clear()
+    convert.inline_cache.resize(0)
+    tracemalloc.start()
+    start = time.perf_counter()
+    root = markdown_to_html_node(markdown)
+    elapsed = time.perf_counter() - start
+    traced, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(root)
+    leaf = root.children[0].children[0]
+    plain = _DictNode()
+    print(json.dumps({
+        "markdown_bytes": len(markdown),
+        "nodes": nodes,
+        "build_s": round(elapsed, 4),
+        "ast_bytes": traced,
+        "peak_bytes": peak,
+        "ast_bytes_per_node": round(traced / nodes, 1),
+        "node_object_bytes": sys.getsizeof(leaf),
+        "dict_node_object_bytes": sys.getsizeof(plain) + sys.getsizeof(plain.__dict__),
+    }))
+
+
+if __name__ == "__main__":
+    main()
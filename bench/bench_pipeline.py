@@ -0,0 +1,79 @@
+# Compares a plain build with the pipelined one (--io) over a synthetic site,
+# with a fixed delay added to every file open to stand in for a network
+# filesystem. Builds go through generate_page_recursive with a manifest, as
+# main.build does, so hashing sources is timed too. Prints one JSON object.
+#
+#   python3 bench/bench_pipeline.py [--pages 300] [--latency-ms 2] [--io 1,4,16]
+import argparse
+import builtins
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import convert
+import manifest
+import output
+import pipeline
+from main import RenderSettings, generate_page_recursive
+from manifest import Manifest
+from corpus import add_config_arguments, config_from_args, generate_site
+
+
+# Puts a delay in front of every open() made by the modules that do page I/O.
+@contextlib.contextmanager
+def slow_open(latency: float):
+    def open_(*args, **kwargs):
+        time.sleep(latency)
+        return builtins.open(*args, **kwargs)
+
+    modules = [convert, manifest, output, pipeline]
+    for module in modules:
+        module.open = open_
+    try:
+        yield
+    finally:
+        for module in modules:
+            del module.open
+
+
+def run(root: str, io_threads: int) -> tuple[float, str|None]:
+    template = os.path.join(root, "template.html")
+    settings = RenderSettings(template, "/", io=io_threads)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        pages = Manifest(os.path.join(root, f"manifest-{io_threads}.json"), template, "/")
+        generate_page_recursive(os.path.join(root, "content"), template, os.path.join(root, "out"), "/", pages,
+                                settings=settings)
+    elapsed = time.perf_counter() - start
+    summary = [line for line in out.getvalue().splitlines() if line.startswith("Pipeline:")]
+    return elapsed, summary[0] if summary else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plain vs pipelined builds over slow file I/O")
+    add_config_arguments(parser)
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="added to every file open")
+    parser.add_argument("--io", default="1,4,16", help="comma separated I/O thread counts to try")
+    parser.set_defaults(pages=300)
+    args = parser.parse_args()
+    config = config_from_args(args)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_site(tmp, config)
+        with slow_open(args.latency_ms / 1000):
+            for io_threads in [0] + [int(n) for n in args.io.split(",")]:
+                elapsed, summary = run(tmp, io_threads)
+                results.append({"io": io_threads, "total_s": round(elapsed, 4), "pipeline": summary})
+    print(json.dumps({"config": config.to_dict(), "latency_ms": args.latency_ms, "runs": results}, indent=1))
+
+
+if __name__ == "__main__":
+    main()
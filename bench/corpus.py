@@ -0,0 +1,130 @@
+# Synthetic site generator for the benchmarks. Produces a content/ tree of
+# markdown pages plus a template.html and static/ like the real site's.
+#
+#   python3 bench/corpus.py OUT_DIR [--pages 1000] [--page-size 4096] ...
+import argparse
+import os
+import random
+
+WORDS = (
+    "the of and to in is was that for it with as his on be at by had are but from or "
+    "have an they which one you were her all she there would their we him been has when "
+    "who will more no if out so said what up its about into than them can only other "
+    "hobbit ring shire elf dwarf wizard mountain river forest road tale song"
+).split()
+
+
+class CorpusConfig:
+    def __init__(self,
+                 pages: int = 1000,
+                 page_size: int = 4096,
+                 link_density: float = 0.05,
+                 image_density: float = 0.01,
+                 list_ratio: float = 0.2,
+                 code_ratio: float = 0.1,
+                 seed: int = 1,
+                 ):
+        self.pages = pages
+        # approximate markdown bytes per page
+        self.page_size = page_size
+        # chance that any given word is a link / image
+        self.link_density = link_density
+        self.image_density = image_density
+        # share of blocks that are lists / fenced code
+        self.list_ratio = list_ratio
+        self.code_ratio = code_ratio
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def _inline(rng: random.Random, config: CorpusConfig, words: int) -> str:
+    out = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < config.link_density:
+            out.append(f"[{word}](/pages/{rng.randrange(config.pages)})")
+        elif roll < config.link_density + config.image_density:
+            out.append(f"![{word}](/images/{word}.png)")
+        elif roll < config.link_density + config.image_density + 0.03:
+            out.append(f"**{word}**")
+        elif roll < config.link_density + config.image_density + 0.05:
+            out.append(f"_{word}_")
+        elif roll < config.link_density + config.image_density + 0.06:
+            out.append(f"`{word}`")
+        else:
+            out.append(word)
+    return " ".join(out)
+
+
+def generate_markdown(rng: random.Random, config: CorpusConfig, title: str) -> str:
+    blocks = [f"# {title}"]
+    size = len(blocks[0])
+    while size < config.page_size:
+        roll = rng.random()
+        if roll < config.code_ratio:
+            lines = "\n".join(_inline(rng, CorpusConfig(link_density=0, image_density=0), 6) for _ in range(rng.randint(2, 8)))
+            block = f"```\n{lines}\n```"
+        elif roll < config.code_ratio + config.list_ratio:
+            items = rng.randint(2, 10)
+            if rng.random() < 0.5:
+                block = "\n".join(f"- {_inline(rng, config, rng.randint(3, 12))}" for _ in range(items))
+            else:
+                block = "\n".join(f"{i}. {_inline(rng, config, rng.randint(3, 12))}" for i in range(1, min(items, 9) + 1))
+        elif roll < config.code_ratio + config.list_ratio + 0.1:
+            block = f"## {_inline(rng, CorpusConfig(link_density=0, image_density=0), rng.randint(2, 6))}"
+        elif roll < config.code_ratio + config.list_ratio + 0.15:
+            block = "\n".join(f"> {_inline(rng, config, 10)}" for _ in range(rng.randint(1, 3)))
+        else:
+            block = "\n".join(_inline(rng, config, rng.randint(10, 25)) for _ in range(rng.randint(1, 5)))
+        blocks.append(block)
+        size += len(block) + 2
+    return "\n\n".join(blocks) + "\n"
+
+
+# Writes the site under root (root/content, root/static, root/template.html)
+# and returns the list of markdown paths.
+def generate_site(root: str, config: CorpusConfig) -> list[str]:
+    rng = random.Random(config.seed)
+    paths = []
+    for i in range(config.pages):
+        # spread pages over a few levels of directories like a real blog
+        rel = os.path.join("section-%d" % (i % 10), "topic-%d" % (i // 10 % 10), f"page-{i}", "index.md")
+        path = os.path.join(root, "content", rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(generate_markdown(rng, config, f"Page {i}"))
+        paths.append(path)
+
+    os.makedirs(os.path.join(root, "static", "images"), exist_ok=True)
+    with open(os.path.join(root, "static", "index.css"), "w") as f:
+        f.write("body { margin: 0 auto; max-width: 800px; }\n")
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "..", "template.html")) as src, open(os.path.join(root, "template.html"), "w") as dst:
+        dst.write(src.read())
+    return paths
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    defaults = CorpusConfig()
+    for name, value in defaults.to_dict().items():
+        parser.add_argument("--" + name.replace("_", "-"), type=type(value), default=value)
+
+
+def config_from_args(args: argparse.Namespace) -> CorpusConfig:
+    return CorpusConfig(**{name: getattr(args, name) for name in CorpusConfig().to_dict()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic site for benchmarking")
+    parser.add_argument("out")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    paths = generate_site(args.out, config_from_args(args))
+    print(f"Wrote {len(paths)} pages under {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Times each stage of page generation over a synthetic site and writes the
+# results as JSON, so runs on different commits can be compared.
+#
+#   python3 bench/stages.py [--pages 500] [--out bench_output.txt]
+#   python3 bench/stages.py --compare old.json [--threshold 0.1]
+#
+# Stages: read (file I/O in), markdown_to_blocks, parse_block (block
+# classification), text_to_text_nodes, build_nodes (the rest of markdown -> node tree),
+# to_html, template, write (file I/O out). Inner stages are measured by
+# wrapping the functions convert.py calls, and are subtracted from the
+# stages that contain them, so the numbers add up to the total.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+
+import convert
+from template import load_template
+from corpus import add_config_arguments, config_from_args, generate_site
+
+STAGES = ["read", "markdown_to_blocks", "parse_block", "text_to_text_nodes",
+          "build_nodes", "to_html", "template", "write"]
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+
+    # Replaces convert.<name> with a version that adds its time to the stage.
+    def wrap(self, name: str):
+        original = getattr(convert, name)
+        totals = self.totals
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                totals[name] += time.perf_counter() - start
+
+        setattr(convert, name, timed)
+        return original
+
+
+def run_once(paths: list[str], template_path: str, out_dir: str) -> dict[str, float]:
+    # every run parses from cold, rather than replaying the last run's inline cache
+    convert.inline_cache.clear()
+    timer = StageTimer()
+    originals = {name: timer.wrap(name) for name in ["markdown_to_blocks", "parse_block", "text_to_text_nodes"]}
+    totals = timer.totals
+    template = load_template(template_path, "/")
+    try:
+        for i, path in enumerate(paths):
+            start = time.perf_counter()
+            with open(path) as f:
+                markdown = f.read()
+            totals["read"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            inner = totals["markdown_to_blocks"] + totals["parse_block"] + totals["text_to_text_nodes"]
+            title = convert.extract_title(markdown)
+            node = convert.markdown_to_html_node(markdown)
+            inner = totals["markdown_to_blocks"] + totals["parse_block"] + totals["text_to_text_nodes"] - inner
+            totals["build_nodes"] += time.perf_counter() - start - inner
+
+            start = time.perf_counter()
+            content = node.to_html()
+            totals["to_html"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            page = template.render({"Title": title, "Content": content})
+            totals["template"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            with open(os.path.join(out_dir, f"{i}.html"), "w") as f:
+                f.write(page)
+            totals["write"] += time.perf_counter() - start
+    finally:
+        for name, original in originals.items():
+            setattr(convert, name, original)
+    return totals
+
+
+def git_commit() -> str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Returns the stages that got slower than old by more than threshold.
+def compare(old: dict, new: dict, threshold: float) -> list[dict]:
+    regressions = []
+    for stage, result in new["stages"].items():
+        before = old.get("stages", {}).get(stage, {}).get("total_s")
+        if not before:
+            continue
+        change = result["total_s"] / before - 1
+        if change > threshold:
+            regressions.append({"stage": stage, "before_s": before, "after_s": result["total_s"], "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark over a synthetic site")
+    add_config_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of N runs per stage")
+    parser.add_argument("--out", help="write the JSON result here as well as to stdout")
+    parser.add_argument("--compare", help="a previous result to check for regressions against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown per stage (0.10 = 10%%)")
+    parser.set_defaults(pages=500)
+    args = parser.parse_args()
+    config = config_from_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_site(tmp, config)
+        source_bytes = sum(os.path.getsize(p) for p in paths)
+        out_dir = os.path.join(tmp, "out")
+        os.makedirs(out_dir)
+        runs = [run_once(paths, os.path.join(tmp, "template.html"), out_dir) for _ in range(args.repeat)]
+        output_bytes = sum(os.path.getsize(os.path.join(out_dir, n)) for n in os.listdir(out_dir))
+
+    stages = {}
+    for stage in STAGES:
+        best = min(run[stage] for run in runs)
+        stages[stage] = {"total_s": round(best, 6), "per_page_us": round(best / config.pages * 1e6, 2)}
+    result = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "config": config.to_dict(),
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "total_s": round(sum(s["total_s"] for s in stages.values()), 6),
+        "stages": stages,
+    }
+    text = json.dumps(result, indent=1)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), result, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']}: {r['before_s']}s -> {r['after_s']}s (+{r['change']:.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
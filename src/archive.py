@@ -0,0 +1,170 @@
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from compress import CODECS, COMPRESSIBLE
+
+# output archive suffixes, longest first
+ARCHIVE_FORMATS = [".tar.gz", ".tgz", ".tar", ".zip"]
+# the earliest time a zip entry can carry
+ZIP_EPOCH = 315532800
+# streamed pages are spooled in memory up to this size, then to a temp file
+SPOOL_SIZE = 1 << 20
+
+
+def is_archive(path: str) -> bool:
+    return any(path.endswith(suffix) for suffix in ARCHIVE_FORMATS)
+
+
+# Every entry gets the same timestamp: $SOURCE_DATE_EPOCH if set (see
+# reproducible-builds.org), otherwise the epoch.
+def archive_mtime() -> int:
+    return int(os.environ.get("SOURCE_DATE_EPOCH", 0))
+
+
+################################################################################
+# Stands in for an OutputWriter (see output.py), adding every output to a tar
+# or zip archive (by path's suffix) instead of writing it under root. Entries
+# are named relative to root and given a fixed timestamp, owner and mode, so
+# the same outputs added in the same order make the same archive, byte for
+# byte. With codecs, text outputs get a compressed sibling entry as
+# compress.compress_outputs would write next to them.
+#
+# The archive is written to a temp file and moved into place by close, so a
+# failed build leaves the previous one where it was.
+#
+# with ArchiveWriter("site.tar.gz", "docs") as archive:
+#     archive.write("docs/index.html", html)
+#     archive.add_file("docs/index.css", "static/index.css")
+################################################################################
+class ArchiveWriter:
+    def __init__(self, path: str, root: str, codecs: list[str]|None = None, level: int|None = None):
+        self.path = path
+        self.root = root
+        self.codecs = [CODECS[name] for name in codecs or []]
+        self.level = level
+        self.mtime = archive_mtime()
+        self.written = 0
+        self.unchanged = 0
+        # pipeline writer threads and streamed pages share the archive
+        self._lock = threading.Lock()
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._raw = open(self._tmp_path, "wb")
+        self._zip = self._tar = self._gzip = None
+        if path.endswith(".zip"):
+            self._zip = zipfile.ZipFile(self._raw, "w", zipfile.ZIP_DEFLATED)
+        elif path.endswith((".tar.gz", ".tgz")):
+            # mtime=0 and no file name, so the gzip header is always the same
+            self._gzip = gzip.GzipFile("", "wb", fileobj=self._raw, mtime=0)
+            self._tar = tarfile.open(fileobj=self._gzip, mode="w", format=tarfile.PAX_FORMAT)
+        else:
+            self._tar = tarfile.open(fileobj=self._raw, mode="w", format=tarfile.PAX_FORMAT)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(keep=exc_type is None)
+
+    def name(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root)
+        if rel.startswith(".."):
+            raise ValueError(f"{path} is outside {self.root}")
+        return rel.replace(os.sep, "/")
+
+    # nothing to create: directories are implied by entry names
+    def ensure_dir(self, path: str):
+        pass
+
+    def _add(self, name: str, size: int, f):
+        if self._zip is not None:
+            info = zipfile.ZipInfo(name, _zip_time(self.mtime))
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with self._zip.open(info, "w") as entry:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    entry.write(chunk)
+            return
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self.mtime
+        info.mode = 0o644
+        self._tar.addfile(info, f)
+
+    # f holds the size bytes of entry name, read from the start once per codec.
+    # Codecs that can compress in chunks do so into a spool, so a big page is
+    # never held whole; a sibling is only added if it is smaller.
+    def _add_siblings(self, name: str, f, size: int):
+        if os.path.splitext(name)[1] not in COMPRESSIBLE:
+            return
+        for codec in self.codecs:
+            level = self.level if self.level is not None else codec.default_level
+            f.seek(0)
+            if codec.compressor is None:
+                compressed = codec.compress(f.read(), level)
+                if len(compressed) < size:
+                    self._add(name + codec.extension, len(compressed), io.BytesIO(compressed))
+                continue
+            compressor = codec.compressor(level)
+            with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as out:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    out.write(compressor.compress(chunk))
+                out.write(compressor.flush())
+                if out.tell() < size:
+                    compressed_size = out.tell()
+                    out.seek(0)
+                    self._add(name + codec.extension, compressed_size, out)
+
+    def write(self, path: str, data: bytes|str) -> bool:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        name = self.name(path)
+        with self._lock:
+            self._add(name, len(data), io.BytesIO(data))
+            self._add_siblings(name, io.BytesIO(data), len(data))
+            self.written += 1
+        return True
+
+    # a file already on disk, such as a static asset, read as it is added
+    def add_file(self, path: str, source_path: str):
+        name = self.name(path)
+        with self._lock, open(source_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._add(name, size, f)
+            self._add_siblings(name, f, size)
+            self.written += 1
+
+    # For pages too big to hold in memory: spooled, then added whole (tar
+    # needs an entry's size before its bytes).
+    @contextmanager
+    def open_text(self, path: str):
+        with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+            text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+            yield text
+            text.flush()
+            size = spool.tell()
+            name = self.name(path)
+            with self._lock:
+                spool.seek(0)
+                self._add(name, size, spool)
+                self._add_siblings(name, spool, size)
+                self.written += 1
+            text.detach()
+
+    def close(self, keep: bool = True):
+        for handle in (self._zip, self._tar, self._gzip, self._raw):
+            if handle is not None:
+                handle.close()
+        if keep:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+
+def _zip_time(mtime: int) -> tuple:
+    return time.gmtime(max(mtime, ZIP_EPOCH))[:6]
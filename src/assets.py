@@ -0,0 +1,232 @@
+import json
+import os
+import shutil
+from manifest import CACHE_PATH, file_hash, inputs_hash
+
+ASSET_MANIFEST_PATH = os.path.join(CACHE_PATH, "assets.json")
+HASH_CACHE_PATH = os.path.join(CACHE_PATH, "hashes.json")
+# published next to the pages, for anything outside the build that needs to
+# find an asset by its original name
+PUBLISHED_ASSET_MAP = "asset-manifest.json"
+
+# digest characters kept in a fingerprinted name
+FINGERPRINT_LENGTH = 8
+# served from fixed, well-known URLs, so never renamed
+UNFINGERPRINTED = {"favicon.ico", "robots.txt"}
+
+
+################################################################################
+# Content hashes of files, remembered across builds by (size, mtime) so that
+# only files which actually changed are read and hashed again.
+#
+# hashes = HashCache(HASH_CACHE_PATH)
+# hashes.digest("static/index.css")
+# hashes.save()
+################################################################################
+class HashCache:
+    def __init__(self, path: str = HASH_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.changed = False
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def digest(self, path: str) -> str:
+        st = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = file_hash(path)
+        self.entries[path] = [st.st_size, st.st_mtime_ns, digest]
+        self.changed = True
+        return digest
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+
+################################################################################
+# Root-relative URLs of static files mapped to their fingerprinted URLs.
+# Handed to the template (see template.rewrite_rooted), which rewrites
+# href/src attributes through it; key changes whenever any mapping does, so
+# pages rendered against an older map are never mistaken for fresh.
+#
+# assets = AssetMap({"/index.css": "/index.3f2a9c01.css"})
+# assets.get("/index.css", "/index.css")   # "/index.3f2a9c01.css"
+################################################################################
+class AssetMap:
+    def __init__(self, urls: dict[str, str]):
+        self.urls = urls
+        self.key = inputs_hash(*(f"{k}={v}" for k, v in sorted(urls.items())))
+
+    def get(self, url: str, default: str|None = None) -> str|None:
+        return self.urls.get(url, default)
+
+    def __bool__(self) -> bool:
+        return bool(self.urls)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, AssetMap) and self.urls == other.urls
+
+    def to_json(self) -> str:
+        return json.dumps(self.urls, indent=1, sort_keys=True) + "\n"
+
+
+# "images/tolkien.png" -> "images/tolkien.1a2b3c4d.png"
+def fingerprinted_name(rel_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+# Builds the asset map for every file under source. Hand-written HTML and the
+# well-known files in UNFINGERPRINTED keep their names.
+def fingerprint_assets(source: str, hashes: HashCache) -> AssetMap:
+    urls = {}
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name in UNFINGERPRINTED or name.endswith(".html"):
+                continue
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(path, source).replace(os.sep, "/")
+            urls["/" + rel_path] = "/" + fingerprinted_name(rel_path, hashes.digest(path))
+    return AssetMap(urls)
+
+
+def _same_file(source: os.stat_result, dest: os.stat_result, checksum: bool, source_path: str, dest_path: str) -> bool:
+    if (source.st_dev, source.st_ino) == (dest.st_dev, dest.st_ino):
+        return True
+    if source.st_size != dest.st_size:
+        return False
+    if checksum:
+        return file_hash(source_path) == file_hash(dest_path)
+    # copies keep the source's mtime, see _copy_file
+    return source.st_mtime_ns == dest.st_mtime_ns
+
+
+# Copies through the kernel where possible (copy_file_range can share extents
+# on reflink-capable filesystems) and falls back to a plain userspace copy.
+def _copy_file(source_path: str, dest_path: str, size: int):
+    copy_file_range = getattr(os, "copy_file_range", None)
+    copied = False
+    if copy_file_range is not None:
+        try:
+            with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+                remaining = size
+                while remaining > 0:
+                    n = copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+            copied = remaining == 0
+        except OSError:
+            copied = False
+    if not copied:
+        shutil.copyfile(source_path, dest_path)
+    shutil.copystat(source_path, dest_path)
+
+
+# Writes source over dest via a temporary file and a rename, so a hardlinked
+# dest is replaced rather than written through (which would edit static/).
+def _install_file(source_path: str, dest_path: str, size: int, link: bool):
+    tmp_path = f"{dest_path}.ssg-tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if link:
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            # cross-device or unsupported, copy instead
+            _copy_file(source_path, tmp_path, size)
+    else:
+        _copy_file(source_path, tmp_path, size)
+    os.replace(tmp_path, dest_path)
+
+
+def _remove_empty_parents(path: str, root: str):
+    parent = os.path.dirname(path)
+    while os.path.abspath(parent) != os.path.abspath(root):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            return
+        parent = os.path.dirname(parent)
+
+
+# (source path, published path relative to the output root) for every file
+# under source, in sorted walk order, with fingerprinted names when given an
+# asset map
+def static_files(source: str, assets: AssetMap|None = None):
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        rel_dir = os.path.relpath(dirpath, source)
+        for name in sorted(filenames):
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+            if assets:
+                url = "/" + rel_path.replace(os.sep, "/")
+                rel_path = os.path.normpath(assets.get(url, url)[1:])
+            yield os.path.join(dirpath, name), rel_path
+
+
+################################################################################
+# Mirrors the files under source into dest, touching only what changed:
+# files are compared by size and mtime (or content hash with checksum=True)
+# and only new or modified files are copied (or hardlinked with link=True).
+# Files synced by a previous run whose source has since been removed are
+# deleted; anything else in dest (e.g. generated pages) is left alone.
+#
+# With an asset map, files are published under their fingerprinted names.
+#
+# Returns a dict of counts: {"copied": .., "unchanged": .., "removed": ..}
+################################################################################
+def sync_dir(source: str, dest: str, manifest_path: str = ASSET_MANIFEST_PATH, link: bool = False, checksum: bool = False, assets: AssetMap|None = None):
+    print(f"Syncing {source} to {dest}")
+    previous = []
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            data = json.load(f)
+        if data.get("dest") == dest:
+            previous = data.get("files", [])
+
+    stats = {"copied": 0, "unchanged": 0, "removed": 0}
+    synced = []
+    for source_path, rel_path in static_files(source, assets):
+        dest_path = os.path.join(dest, rel_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        synced.append(rel_path)
+        source_stat = os.stat(source_path)
+        try:
+            dest_stat = os.stat(dest_path)
+            if _same_file(source_stat, dest_stat, checksum, source_path, dest_path):
+                stats["unchanged"] += 1
+                continue
+        except FileNotFoundError:
+            pass
+        print(f"File: {source_path}")
+        _install_file(source_path, dest_path, source_stat.st_size, link)
+        stats["copied"] += 1
+
+    current = set(synced)
+    for rel_path in previous:
+        if rel_path in current:
+            continue
+        orphan = os.path.join(dest, rel_path)
+        if os.path.exists(orphan):
+            print(f"Removing orphaned {orphan}")
+            os.remove(orphan)
+            _remove_empty_parents(orphan, dest)
+            stats["removed"] += 1
+
+    if synced != previous:
+        os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump({"dest": dest, "files": synced}, f, indent=1)
+    return stats
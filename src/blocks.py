@@ -0,0 +1,74 @@
+import re
+from textnode import BlockType as B
+
+_HEADING = re.compile(r"#{1,6} ")
+_ORDERED_ITEM = re.compile(r"\d\. ")
+
+
+class ParsedBlock:
+    __slots__ = ("block_type", "items", "level")
+
+    def __init__(self, block_type: B, items: list[str], level: int = 0):
+        self.block_type = block_type
+        # the inline text of each list item, or a single entry for other blocks
+        self.items = items
+        # heading level, 0 for everything else
+        self.level = level
+
+    def __eq__(self, other):
+        return (self.block_type, self.items, self.level) == (other.block_type, other.items, other.level)
+
+    def __repr__(self):
+        return f"ParsedBlock({self.block_type.value}, {self.items}, {self.level})"
+
+
+################################################################################
+# Classifies a markdown block and pulls out its inline text in one pass over
+# its lines. Headings and code blocks are recognised from the ends of the
+# block; for everything else each line is checked against the quote,
+# unordered and ordered list forms at once, collecting the list items as it
+# goes, so the block is split exactly once.
+#
+# parse_block("- one\n- two")
+# -> ParsedBlock(unordered_list, ['one', 'two'], 0)
+################################################################################
+def parse_block(block: str) -> ParsedBlock:
+    # Headings start with 1-6 # characters, followed by a space and then the heading text.
+    header = _HEADING.match(block)
+    if header:
+        return ParsedBlock(B.HEADING, [block[header.end():]], header.end() - 1)
+    # Code blocks must start with 3 backticks and end with 3 backticks.
+    if block[:3] == "```" and block[-3:] == "```":
+        return ParsedBlock(B.CODE, [block[4:-3]])
+
+    lines = block.split("\n")
+    quote = unordered = ordered = True
+    unordered_items = []
+    ordered_items = []
+    for line in lines:
+        # Every line in a quote block must start with a > character.
+        if quote and line[:1] != ">":
+            quote = False
+        # Every line in an unordered list must start with "- ".
+        if unordered:
+            if line[:2] == "- ":
+                unordered_items.append(line[2:])
+            else:
+                unordered = False
+        # Every line in an ordered list must start with a digit, "." and a space.
+        if ordered:
+            if _ORDERED_ITEM.match(line):
+                ordered_items.append(line.strip()[3:])
+            else:
+                ordered = False
+        if not (quote or unordered or ordered):
+            break
+
+    if quote:
+        return ParsedBlock(B.QUOTE, [block.replace(">", "").strip()])
+    if unordered:
+        return ParsedBlock(B.UNORDERED_LIST, unordered_items)
+    if ordered:
+        return ParsedBlock(B.ORDERED_LIST, ordered_items)
+    # If none of the above conditions are met, the block is a normal paragraph.
+    return ParsedBlock(B.PARAGRAPH, [" ".join(lines)])
@@ -0,0 +1,54 @@
+import convert
+from convert import inline_cache, use_images, INLINE_CACHE_SIZE
+
+# Shared by main.py and the modules that render pages for it (pipeline.py,
+# server.py, preview.py), which import them from here: run as a script, main
+# is __main__, and importing it again would define a second PageError.
+CONTENT_PATH = "content"
+STATIC_ASSETS_PATH = "static"
+TEMPLATE_PATH = "template.html"
+WEB_PATH = "docs"
+
+
+class PageError(Exception):
+    def __init__(self, source: str, message: str):
+        super().__init__(source, message)
+        self.source = source
+        self.message = message
+
+    def __str__(self):
+        return f"{self.source}: {self.message}"
+
+
+# Everything a page render needs besides its own paths. Sent to each pool
+# worker once per chunk of pages, so it must stay picklable.
+class RenderSettings:
+    def __init__(self, template: str, basepath: str, profile: bool = False, inline_cache: int = INLINE_CACHE_SIZE, assets=None, images=None, minify: bool = False, content_cache: str|None = None, io: int = 0, memory_budget: int = 0):
+        self.template = template
+        self.basepath = basepath
+        self.profile = profile
+        self.inline_cache = inline_cache
+        # an AssetMap when static files are fingerprinted
+        self.assets = assets
+        # an ImageSizes when <img> tags get sizes and lazy loading
+        self.images = images
+        self.minify = minify
+        # directory of the content cache, None to always parse
+        self.content_cache = content_cache
+        # I/O threads for the pipelined build (see pipeline.py), 0 for none
+        self.io = io
+        # bytes each build process should stay under, 0 for no limit
+        self.memory_budget = memory_budget
+
+    # run in whichever process is about to render pages with these settings
+    def apply(self):
+        if inline_cache.maxsize != self.inline_cache:
+            inline_cache.resize(self.inline_cache)
+        use_images(self.images)
+
+    # sources bigger than this are streamed rather than held whole (see
+    # generate_page): lower under a memory budget
+    def stream_threshold(self) -> int:
+        if self.memory_budget:
+            return min(convert.STREAM_THRESHOLD, self.memory_budget // 16)
+        return convert.STREAM_THRESHOLD
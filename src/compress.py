@@ -0,0 +1,133 @@
+import gzip
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from assets import HashCache
+from manifest import CACHE_PATH
+from output import default_writer
+
+COMPRESS_CACHE_PATH = os.path.join(CACHE_PATH, "compressed.json")
+# outputs worth compressing; images and fonts are compressed already
+COMPRESSIBLE = {".html", ".css", ".js", ".json", ".txt", ".xml", ".svg"}
+
+
+class Codec:
+    def __init__(self, name: str, extension: str, compress, default_level: int, compressor=None):
+        self.name = name
+        # appended to the output's name for its sibling, e.g. ".gz"
+        self.extension = extension
+        # compress(data: bytes, level: int) -> bytes
+        self.compress = compress
+        self.default_level = default_level
+        # compressor(level) -> an object with compress(chunk) and flush(), as
+        # zlib.compressobj returns, for data too big to hold; None if the codec
+        # can only compress whole
+        self.compressor = compressor
+
+
+# name -> Codec; add to it with register_codec
+CODECS = {}
+
+
+def register_codec(name: str, extension: str, compress, default_level: int, compressor=None):
+    CODECS[name] = Codec(name, extension, compress, default_level, compressor)
+
+
+# mtime=0 so that the same page always compresses to the same bytes; wbits=31
+# writes the same zeroed gzip header
+register_codec("gzip", ".gz", lambda data, level: gzip.compress(data, level, mtime=0), 9,
+               lambda level: zlib.compressobj(level, zlib.DEFLATED, 31))
+
+
+# top-level so it can be pickled over to pool workers. Returns whether a
+# sibling was kept: False when compressing did not make the file smaller, in
+# which case a sibling is removed only if owned (written by an earlier run).
+def _compress_job(job: tuple[str, str, int, bool]) -> bool:
+    path, codec_name, level, owned = job
+    codec = CODECS[codec_name]
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = codec.compress(data, level)
+    sibling = path + codec.extension
+    if len(compressed) >= len(data):
+        if owned and os.path.exists(sibling):
+            os.remove(sibling)
+        return False
+    default_writer.write(sibling, compressed)
+    return True
+
+
+################################################################################
+# Writes a precompressed sibling (index.html.gz, ...) next to every text
+# output under root, for servers that can send them as they are. Outputs whose
+# hash and level match the previous run are skipped, compression runs over
+# a process pool when jobs > 1, and an output that would not shrink gets no
+# sibling at all. Siblings this stage wrote (as its cache records) for an
+# output that has since gone are removed; any other file that looks like a
+# sibling, such as one shipped precompressed in static/, is left alone.
+#
+# Returns a dict of counts:
+# {"compressed": .., "unchanged": .., "skipped": .., "removed": ..}
+################################################################################
+def compress_outputs(root: str, codecs: list[str], level: int|None = None, jobs: int = 1,
+                     hashes: HashCache|None = None, cache_path: str = COMPRESS_CACHE_PATH) -> dict[str, int]:
+    if hashes is None:
+        hashes = HashCache()
+    previous = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            previous = json.load(f)
+
+    extensions = {CODECS[name].extension for name in codecs}
+    stats = {"compressed": 0, "unchanged": 0, "skipped": 0, "removed": 0}
+    current = {}
+    todo = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            base, ext = os.path.splitext(path)
+            if ext in extensions and os.path.splitext(base)[1] in COMPRESSIBLE:
+                continue
+            if ext not in COMPRESSIBLE:
+                continue
+            digest = hashes.digest(path)
+            entries = current[path] = {}
+            for codec_name in codecs:
+                codec = CODECS[codec_name]
+                codec_level = codec.default_level if level is None else level
+                # [output digest, level, whether a sibling was written]
+                entry = previous.get(path, {}).get(codec_name)
+                if entry is not None and entry[:2] == [digest, codec_level] and (not entry[2] or os.path.exists(path + codec.extension)):
+                    entries[codec_name] = entry
+                    stats["unchanged" if entry[2] else "skipped"] += 1
+                    continue
+                todo.append((path, codec_name, codec_level, bool(entry and entry[2])))
+                entries[codec_name] = [digest, codec_level, None]
+    for path in sorted(set(previous) - set(current)):
+        for codec_name, entry in previous[path].items():
+            codec = CODECS.get(codec_name)
+            if codec is not None and entry[2] and os.path.exists(path + codec.extension):
+                print(f"Removing orphaned {path + codec.extension}")
+                os.remove(path + codec.extension)
+                stats["removed"] += 1
+
+    if jobs <= 1 or len(todo) <= 1:
+        results = [_compress_job(job) for job in todo]
+    else:
+        chunksize = max(1, len(todo) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_compress_job, todo, chunksize=chunksize))
+    for (path, codec_name, _, _), shrank in zip(todo, results):
+        current[path][codec_name][2] = shrank
+        stats["compressed" if shrank else "skipped"] += 1
+
+    if current != previous:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(current, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, cache_path)
+    hashes.save()
+    return stats
@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from manifest import CACHE_PATH, GENERATOR_VERSION
+
+CONTENT_CACHE_PATH = os.path.join(CACHE_PATH, "content")
+# entries not used by any build for this long are pruned
+CONTENT_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# names of entries in the cache directory and in exported archives
+_ENTRY_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{62}$")
+
+
+################################################################################
+# Rendered content HTML (and title) of markdown pages, one file per entry,
+# keyed by a hash of the markdown and of everything else the content HTML
+# depends on (the parser version, image sizes, minifying). The basepath and
+# asset rewrites happen later, as the content is written into the template,
+# so a template or basepath change finds every page here and only has to
+# assemble and write it.
+#
+# Whole pages are kept too, keyed by the markdown, the compiled template (see
+# Template.digest, which covers the basepath) and the generator version, so
+# a page rendered anywhere with the same inputs is never rendered again.
+# Nothing in a key depends on where the site is checked out, so entries can
+# be exported to an archive and imported on another machine (see
+# export/import_archive, and pull/push for a shared store directory).
+#
+# Entries are written via a temp file and a rename, so pool workers can share
+# the cache without locking.
+#
+# cache = ContentCache(CONTENT_CACHE_PATH)
+# key = cache.key(markdown, variant)
+# cached = cache.get(key)        # None, or (title, html, meta)
+# cache.put(key, title, html, {"unquoted": 12})
+# key = cache.page_key(markdown, template, variant)
+# cached = cache.get_page(key)   # None, or (page bytes, meta)
+################################################################################
+class ContentCache:
+    def __init__(self, root: str = CONTENT_CACHE_PATH):
+        self.root = root
+
+    def key(self, markdown: str, variant: str) -> str:
+        digest = hashlib.sha256(variant.encode())
+        digest.update(b"\0")
+        digest.update(markdown.encode("utf-8"))
+        return digest.hexdigest()
+
+    def page_key(self, markdown: str, template, variant: str) -> str:
+        return self.key(markdown, f"page\0{GENERATOR_VERSION}\0{template.digest}\0{variant}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key: str) -> tuple[str, str, dict]|None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                html = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        # marks the entry as in use, see prune
+        os.utime(path)
+        return header.pop("title"), html, header
+
+    def put(self, key: str, title: str, html: str, meta: dict|None = None):
+        header = json.dumps({"title": title, **(meta or {})}) + "\n"
+        self._write(self._path(key), (header + html).encode("utf-8"))
+
+    def get_page(self, key: str) -> tuple[bytes, dict]|None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                page = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return page, meta
+
+    def put_page(self, key: str, page: bytes, meta: dict|None = None):
+        self._write(self._path(key), json.dumps(meta or {}).encode() + b"\n" + page)
+
+    def keys(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, prefix)
+            if os.path.isdir(directory):
+                for rest in sorted(os.listdir(directory)):
+                    if _ENTRY_NAME.match(f"{prefix}/{rest}"):
+                        yield prefix + rest
+
+    # Packs entries (every one by default) into a gzipped tar with fixed
+    # timestamps, names and owners, so the same entries make the same archive.
+    # Returns how many went in.
+    def export(self, archive_path: str, keys=None) -> int:
+        count = 0
+        tmp_path = f"{archive_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as raw, gzip.GzipFile("", "wb", fileobj=raw, mtime=0) as gz, \
+                tarfile.open(fileobj=gz, mode="w") as tar:
+            for key in sorted(self.keys() if keys is None else keys):
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                info = tarfile.TarInfo(f"{key[:2]}/{key[2:]}")
+                info.size = len(data)
+                info.mode = 0o644
+                tar.addfile(info, io.BytesIO(data))
+                count += 1
+        os.replace(tmp_path, archive_path)
+        return count
+
+    # Unpacks an archive made by export, skipping entries already here and
+    # anything that is not an entry. Returns (imported, every key in it).
+    def import_archive(self, archive_path: str) -> tuple[int, set[str]]:
+        imported = 0
+        keys = set()
+        with tarfile.open(archive_path, "r:*") as tar:
+            for member in tar:
+                if not member.isfile() or not _ENTRY_NAME.match(member.name):
+                    continue
+                key = member.name.replace("/", "")
+                keys.add(key)
+                path = self._path(key)
+                if os.path.exists(path):
+                    continue
+                self._write(path, tar.extractfile(member).read())
+                imported += 1
+        return imported, keys
+
+    # Imports every archive in store, a directory shared between machines.
+    # Returns (entries imported, every key the store holds).
+    def pull(self, store: str) -> tuple[int, set[str]]:
+        imported = 0
+        known = set()
+        if os.path.isdir(store):
+            for name in sorted(os.listdir(store)):
+                if name.endswith(".tar.gz"):
+                    count, keys = self.import_archive(os.path.join(store, name))
+                    imported += count
+                    known |= keys
+        return imported, known
+
+    # Exports the entries store does not have yet (known, as pull returned it)
+    # into one new archive there, named after its contents so that builders
+    # pushing at once never overwrite each other. Returns how many went in.
+    def push(self, store: str, known: set[str]) -> int:
+        keys = [key for key in self.keys() if key not in known]
+        if not keys:
+            return 0
+        os.makedirs(store, exist_ok=True)
+        name = hashlib.sha256("\0".join(keys).encode()).hexdigest()[:16]
+        return self.export(os.path.join(store, f"content-{name}.tar.gz"), keys)
+
+    # Removes entries that no build has used for max_age seconds. Returns how
+    # many went.
+    def prune(self, max_age: float = CONTENT_CACHE_MAX_AGE) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - max_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
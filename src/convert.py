@@ -2,7 +2,17 @@ import os
 import re
 from typing import List, Union
 from textnode import TextNode, TextType as T, BlockType as B
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, attribute_minifier, writer_fn
+from template import load_template
+from inline import tokenize_inline
+from blocks import parse_block
+from profiling import PageProfile, count_nodes
+from cache import LRUCache
+from output import OutputWriter, default_writer
+from content_cache import ContentCache
+
+# an images.ImageSizes while <img> tags get sizes and lazy loading, see use_images
+image_sizes = None
 
 def text_node_to_html_node(text_node: TextNode):
     match(text_node.text_type):
@@ -23,7 +33,10 @@ def text_node_to_html_node(text_node: TextNode):
             return LeafNode('a', text_node.text, {"href": text_node.url})
         # TextType.IMAGE: "img" tag, empty string value, "src" and "alt" props ("src" is the image URL, "alt" is the alt text)
         case(T.IMAGE):
-            return LeafNode('img', "", {"src": text_node.url, "alt": text_node.text})
+            props = {"src": text_node.url, "alt": text_node.text}
+            if image_sizes is not None:
+                props.update(image_sizes.attributes(text_node.url))
+            return LeafNode('img', "", props)
         case _:
             raise Exception(f"Type {text_node.text_type} not an allowable value")
 
@@ -124,7 +137,8 @@ def split_nodes_link(nodes: list[TextNode]):
             split_nodes.append(TextNode(nodetext, T.NORMAL))
     return split_nodes
 
-def text_to_text_nodes(text: str):
+# The original five-pass pipeline, kept for comparison in bench/bench_inline.py.
+def text_to_text_nodes_multipass(text: str):
     textNodes = [TextNode(text, T.NORMAL)]
     delimiters = {
         "**": T.BOLD,
@@ -139,51 +153,66 @@ def text_to_text_nodes(text: str):
 
     return textNodes
 
+def text_to_text_nodes(text: str):
+    return tokenize_inline(text)
+
 def markdown_to_blocks(text:str):
     blocks = text.split("\n\n")
     blocks = [b.strip() for b in blocks if b.strip()]
 
     return blocks
 
+################################################################################
+# Lazily yields the same blocks as markdown_to_blocks from an iterable of
+# lines: an open file, or e.g. (l.decode() for l in iter(mm.readline, b""))
+# over an mmap. Only the block being assembled is held in memory.
+################################################################################
+def read_blocks(lines):
+    block = []
+    for line in lines:
+        if line.endswith("\n"):
+            line = line[:-1]
+        if line:
+            block.append(line)
+            continue
+        text = "\n".join(block).strip()
+        block = []
+        if text:
+            yield text
+    text = "\n".join(block).strip()
+    if text:
+        yield text
+
 def block_to_block_type(block: str):
-    # Headings start with 1-6 # characters, followed by a space and then the heading text.
-    if re.match(r"#{1,6} .*", block):
-        return B.HEADING
-    # Code blocks must start with 3 backticks and end with 3 backticks.
-    if block[:3] == '```' and block[-3:] == "```":
-        return B.CODE
-    # Every line in a quote block must start with a > character.
-    quote_block = True
-    for line in block.split("\n"):
-        if not(line) or line[0] != ">":
-            quote_block = False
-            break
-    if quote_block:
-        return B.QUOTE
-    # Every line in an unordered list block must start with a - character, followed by a space.
-    ul_block = True
-    for line in block.split("\n"):
-        if len(line)<2 or line[:2] != "- ":
-            ul_block = False
-            break
-    if ul_block:
-        return B.UNORDERED_LIST
-    # Every line in an ordered list block must start with a number followed by a . character and a space. The number must start at 1 and increment by 1 for each line.
-    ol_block = True
-    for line in block.split("\n"):
-        if len(line)<3 or not(re.match(r"\d\. ", line)):
-            ol_block = False
-            break
-    if ol_block:
-        return B.ORDERED_LIST
-
-    # If none of the above conditions are met, the block is a normal paragraph.
-    return B.PARAGRAPH
+    return parse_block(block).block_type
 
 
+# Inline fragments repeat a lot across a site (nav links, list items, footer
+# lines), so their parsed children are memoised by source text. Only short
+# fragments are kept, which together with the entry limit caps the memory.
+INLINE_CACHE_SIZE = 4096
+INLINE_CACHE_MAX_TEXT = 512
+inline_cache = LRUCache(INLINE_CACHE_SIZE)
+
+# Switches the image attributes used by text_node_to_html_node. Cached inline
+# fragments hold rendered <img> nodes, so they go when the sizes change.
+def use_images(images):
+    global image_sizes
+    if images != image_sizes:
+        image_sizes = images
+        inline_cache.clear()
+
 def text_to_children(text) -> List[Union[LeafNode, ParentNode]]:
+    cacheable = inline_cache.maxsize > 0 and len(text) <= INLINE_CACHE_MAX_TEXT
+    if cacheable:
+        cached = inline_cache.get(text)
+        if cached is not None:
+            return list(cached)
     text_nodes = text_to_text_nodes(text)
-    return [text_node_to_html_node(node) for node in text_nodes]
+    children = [text_node_to_html_node(node) for node in text_nodes]
+    if cacheable:
+        inline_cache.put(text, tuple(children))
+    return children
 
     # Split the markdown into blocks (you already have a function for this)
     # Loop over each block:
@@ -193,73 +222,169 @@ def text_to_children(text) -> List[Union[LeafNode, ParentNode]]:
     #     The "code" block is a bit of a special case: it should not do any inline markdown parsing of its children. I didn't use my text_to_children function for this block type, I manually made a TextNode and used text_node_to_html_node.
     # Make all the block nodes children under a single parent HTML node (which should just be a div) and return it.
 def markdown_to_html_node(markdown: str, verbose: bool = False):
-    blocks = markdown_to_blocks(markdown)
-    nodes = []
-    for block in blocks:
-        if verbose:
-            print(f"[\n\t{block.strip()}\n]")
-        blocktype = block_to_block_type(block)
-        if verbose:
-            print(f"^ Blocktype {blocktype}")
-        match(blocktype):
-            case (B.HEADING):
-                header = re.match(r"#{1,6} ", block)
-                if not header:
-                    raise Exception("Something is broken")
-                hnum = len(header.group())-1
-                nodes.append(ParentNode("h"+str(hnum), text_to_children(block[header.span()[1]:])))
-            case (B.CODE):
-                nodes.append(ParentNode("pre", [text_node_to_html_node(TextNode(block[4:-3], T.CODETEXT))]))
-            case (B.QUOTE):
-                text = re.sub('>', '', block)
-                nodes.append(ParentNode("blockquote", text_to_children(text.strip())))
-            case (B.UNORDERED_LIST):
-                li = []
-                for line in block.split("\n"):
-                    li.append(ParentNode("li", text_to_children(line[2:])))
-                nodes.append(ParentNode("ul", li))
-            case (B.ORDERED_LIST):
-                li = []
-                for line in block.split("\n"):
-                    li.append(ParentNode("li", text_to_children(re.match(r"(\d* )(.*)", line.strip()[2:]).group(2))))
-                nodes.append(ParentNode("ul", li))
-            case (B.PARAGRAPH):
-                text = " ".join(block.split("\n"))
-                nodes.append(ParentNode("p", text_to_children(text)))
-    return ParentNode("div", nodes)
+    return ParentNode("div", [block_to_html_node(block, verbose) for block in markdown_to_blocks(markdown)])
+
+def block_to_html_node(block: str, verbose: bool = False):
+    if verbose:
+        print(f"[\n\t{block.strip()}\n]")
+    parsed = parse_block(block)
+    if verbose:
+        print(f"^ Blocktype {parsed.block_type}")
+    match(parsed.block_type):
+        case (B.HEADING):
+            return ParentNode("h"+str(parsed.level), text_to_children(parsed.items[0]))
+        case (B.CODE):
+            return ParentNode("pre", [text_node_to_html_node(TextNode(parsed.items[0], T.CODETEXT))])
+        case (B.QUOTE):
+            return ParentNode("blockquote", text_to_children(parsed.items[0]))
+        case (B.UNORDERED_LIST):
+            return ParentNode("ul", [ParentNode("li", text_to_children(item)) for item in parsed.items])
+        case (B.ORDERED_LIST):
+            return ParentNode("ul", [ParentNode("li", text_to_children(item)) for item in parsed.items])
+        case (B.PARAGRAPH):
+            return ParentNode("p", text_to_children(parsed.items[0]))
 
+################################################################################
+# A document rendered one block at a time, straight from a block iterator.
+# Only the block currently being rendered (and its nodes) is ever in memory,
+# however large the source is. Stands in for the ParentNode("div", ...) that
+# markdown_to_html_node returns wherever something is rendered with render_to:
+#
+# with open("huge.md") as f:
+#     StreamedDocument(read_blocks(f)).render_to(outfile)
+################################################################################
+class StreamedDocument:
+    def __init__(self, blocks, verbose: bool = False):
+        self.blocks = blocks
+        self.verbose = verbose
+
+    def render_to(self, writer):
+        write = writer_fn(writer)
+        write("<div>")
+        empty = True
+        for block in self.blocks:
+            block_to_html_node(block, self.verbose).render_to(write)
+            empty = False
+        if empty:
+            raise ValueError("ParentNode must have children")
+        write("</div>")
+
+# md is either the whole document or an iterable of its lines (e.g. an open file)
 def extract_title(md):
-    for line in md.split('\n'):
+    lines = md.split('\n') if isinstance(md, str) else md
+    for line in lines:
         if line[:2] == "# ":
             return line[2:].strip()
     raise Exception("No title found")
 
 
-def generate_page(from_path: str, template_path: str, dest_path: str, verbose: bool = False, basepath: str = '/'):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path) as from_:
-        source_md = from_.read()
-    with open(template_path) as template:
-        template_html = template.read()
+# Sources bigger than this are read and rendered one block at a time.
+STREAM_THRESHOLD = 8 * 1024 * 1024
 
-    title = extract_title(source_md)
-    converted_markdown = markdown_to_html_node(source_md, verbose)
-    if verbose:
-        print(f"{converted_markdown}")
-    converted_markdown = converted_markdown.to_html()
-    template_html = template_html.replace("{{ Title }}", title)
-    template_html = template_html.replace("{{ Content }}", converted_markdown)
-    template_html = template_html.replace('href="/', f'href="{basepath}')
-    template_html = template_html.replace('src="/', f'src="{basepath}')
-    dirs = dest_path.split('/')
-    if len(dirs) > 1:
-        path = ""
-        for dir in dirs[:-1]:
-            if not os.path.exists(path+dir):
-                os.mkdir(path+dir)
-            path = path + dir + '/'
-
-    with open(dest_path, "a+") as outfile:
-        outfile.write(template_html)
+# Bump this whenever a parser or renderer change alters the content HTML a
+# given markdown source turns into, so the content cache is not trusted.
+PARSER_VERSION = "1"
+
+# Everything besides the markdown itself that the content HTML depends on.
+def content_variant(minify: bool) -> str:
+    images = image_sizes.key if image_sizes is not None else ""
+    return f"{PARSER_VERSION}\0{images}\0{int(minify)}"
 
+def generate_page(from_path: str, template_path: str, dest_path: str, verbose: bool = False, basepath: str = '/', profile: PageProfile|None = None, writer: OutputWriter|None = None, assets=None, minify: bool = False, content_cache: ContentCache|None = None, stream_threshold: int|None = None):
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    if profile is None:
+        profile = PageProfile(from_path, dest_path, enabled=False)
+    if writer is None:
+        writer = default_writer
+    template = load_template(template_path, basepath, assets, minify)
+
+    with open(from_path) as from_:
+        profile.bytes_in = os.fstat(from_.fileno()).st_size
+        if profile.bytes_in > (STREAM_THRESHOLD if stream_threshold is None else stream_threshold):
+            hits, misses = inline_cache.hits, inline_cache.misses
+            attribute_minifier.enabled = minify
+            unquoted = attribute_minifier.saved
+            # reading, parsing, rendering and writing are interleaved per block
+            with profile.stage("stream"):
+                title = extract_title(from_)
+                from_.seek(0)
+                written = writer.written
+                with writer.open_text(dest_path) as outfile:
+                    template.render_to(outfile, {"Title": title, "Content": StreamedDocument(read_blocks(from_), verbose)})
+            profile.written = writer.written > written
+            if profile.enabled:
+                profile.bytes_out = os.path.getsize(dest_path)
+            profile.cache_hits, profile.cache_misses = inline_cache.hits - hits, inline_cache.misses - misses
+            if minify:
+                profile.bytes_saved = template.saved + attribute_minifier.saved - unquoted
+            return profile
+        with profile.stage("read"):
+            source_md = from_.read()
+
+    page_bytes = render_page(source_md, template, verbose, profile, minify, content_cache)
+    with profile.stage("write"):
+        profile.written = writer.write(dest_path, page_bytes)
+    return profile
 
+################################################################################
+# The part of generate_page between reading the markdown and writing the page,
+# with no file I/O of its own (bar the content cache), so callers can do
+# their reading and writing however suits them (see pipeline.py).
+#
+# template = load_template("template.html", "/")
+# page_bytes = render_page(markdown, template)
+################################################################################
+def render_page(source_md: str, template, verbose: bool = False, profile: PageProfile|None = None, minify: bool = False, content_cache: ContentCache|None = None) -> bytes:
+    if profile is None:
+        profile = PageProfile("", "", enabled=False)
+    hits, misses = inline_cache.hits, inline_cache.misses
+    attribute_minifier.enabled = minify
+    unquoted = attribute_minifier.saved
+
+    cached = None
+    if content_cache is not None:
+        with profile.stage("content_cache"):
+            page_key = content_cache.page_key(source_md, template, content_variant(minify))
+            page = content_cache.get_page(page_key)
+        if page is not None:
+            page_bytes, meta = page
+            profile.page_cached = True
+            if profile.enabled:
+                profile.bytes_out = len(page_bytes)
+            profile.cache_hits, profile.cache_misses = 0, 0
+            profile.bytes_saved = meta.get("saved", 0)
+            return page_bytes
+        with profile.stage("content_cache"):
+            key = content_cache.key(source_md, content_variant(minify))
+            cached = content_cache.get(key)
+    if cached is not None:
+        title, content_html, meta = cached
+        profile.content_cached = True
+        content_unquoted = meta.get("unquoted", 0)
+    else:
+        with profile.stage("blocks"):
+            title = extract_title(source_md)
+            blocks = markdown_to_blocks(source_md)
+        with profile.stage("inline"):
+            converted_markdown = ParentNode("div", [block_to_html_node(block, verbose) for block in blocks])
+        if verbose:
+            print(f"{converted_markdown}")
+        with profile.stage("render"):
+            content_html = converted_markdown.to_html()
+        content_unquoted = attribute_minifier.saved - unquoted
+        if content_cache is not None:
+            with profile.stage("content_cache"):
+                content_cache.put(key, title, content_html, {"unquoted": content_unquoted})
+        if profile.enabled:
+            profile.nodes = count_nodes(converted_markdown)
+    with profile.stage("template"):
+        page_bytes = template.render({"Title": title, "Content": content_html}).encode("utf-8")
+    if profile.enabled:
+        profile.bytes_out = len(page_bytes)
+    profile.cache_hits, profile.cache_misses = inline_cache.hits - hits, inline_cache.misses - misses
+    if minify:
+        profile.bytes_saved = template.saved + content_unquoted
+    if content_cache is not None:
+        with profile.stage("content_cache"):
+            content_cache.put_page(page_key, page_bytes, {"saved": profile.bytes_saved})
+    return page_bytes
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from main import RenderSettings, generate_pages, walk_pages
+
+# what the tests' sites render with; the link shows the basepath applied
+TEMPLATE = '<title>{{ Title }}</title><a href="/">home</a>{{ Content }}'
+
+
+################################################################################
+# Base for tests that build a small site in a temp dir: self.dir, holding
+# content/ (self.content) and template.html (self.template, from TEMPLATE).
+# Not a test module itself, so test discovery leaves it alone.
+#
+# class TestSomething(SiteTestCase):
+#     def setUp(self):
+#         super().setUp()
+#         self.add_pages(["a", "b/c"])
+################################################################################
+class SiteTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.content = os.path.join(self.dir, "content")
+        self.template = self.write("template.html", TEMPLATE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # path is relative to self.dir, or absolute. bump moves the mtime that
+    # many seconds on, so even a coarse-grained filesystem sees the change.
+    def write(self, path: str, text: str, bump: int = 0) -> str:
+        path = os.path.join(self.dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        if bump:
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump * 1_000_000_000))
+        return path
+
+    # content/<name>/index.md for every name, titled "Page <name>", with body
+    # formatted with the name
+    def add_pages(self, names, body: str = "Some **bold** text in {name}."):
+        for name in names:
+            self.write(os.path.join(self.content, name, "index.md"), f"# Page {name}\n\n" + body.format(name=name))
+
+    # Renders content/ into publish, checking the profiles come back in walk
+    # order. Returns {output path relative to publish: html}.
+    def build(self, publish: str, jobs: int = 1, io: int = 0) -> dict[str, str]:
+        pages = list(walk_pages(self.content, publish))
+        profiles = generate_pages(pages, RenderSettings(self.template, "/ssg/", io=io), jobs)
+        self.assertEqual([p.dest for p in profiles], [dest for _, dest in pages])
+        outputs = {}
+        for _, dest in pages:
+            with open(dest) as f:
+                outputs[os.path.relpath(dest, publish)] = f.read()
+        return outputs
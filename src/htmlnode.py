@@ -1,18 +1,65 @@
+import sys
 from typing import List, Union
+from minify import can_unquote
+
+
+# Normalises the things render_to accepts into a single write(str) callable.
+def writer_fn(writer):
+    if isinstance(writer, list):
+        return writer.append
+    if hasattr(writer, "write"):
+        return writer.write
+    return writer
+
+
+# Writes attributes without the quotes HTML doesn't need, counting the bytes
+# that saves. Switched on by convert.generate_page for minified builds.
+class AttributeMinifier:
+    def __init__(self):
+        self.enabled = False
+        self.saved = 0
+
+    def format(self, name: str, value) -> str:
+        value = f"{value}"
+        if can_unquote(value):
+            self.saved += 2
+            return f"{name}={value}"
+        return f'{name}="{value}"'
+
+
+attribute_minifier = AttributeMinifier()
+
 
 class HTMLNode:
+    # Documents are built from millions of these, so no per-instance __dict__.
+    # Tag names are interned and empty props collapse to None so repeated
+    # tags share storage instead of each carrying their own copies.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self,
                  tag : str|None = None,
                  value : str|None = None,
                  children : List[Union["ParentNode", "LeafNode"]]|None = None,
                  props : dict|None = None
                  ):
-        self.tag = tag
+        self.tag = sys.intern(tag) if tag else tag
         self.value = value
         self.children = children
-        self.props = props
+        self.props = props or None
 
     def to_html(self):
+        parts = []
+        self._render(parts.append)
+        return "".join(parts)
+
+    # Streams the rendered HTML into writer, which can be anything with a
+    # .write() (an open file, io.StringIO), a list to append fragments to, or
+    # a plain callable. Nothing bigger than a single tag or text value is
+    # ever built up in memory.
+    def render_to(self, writer):
+        self._render(writer_fn(writer))
+
+    def _render(self, write):
         raise NotImplementedError("subclass must override")
 
     def props_to_html(self):
@@ -22,7 +69,8 @@ class HTMLNode:
         #         "Cannot convert to html if props is None"
         #     )
 
-
+        if attribute_minifier.enabled:
+            return " ".join([attribute_minifier.format(k, self.props[k]) for k in self.props])
         return " ".join([f'{k}="{self.props[k]}"' for k in self.props])
 
     def __repr__(self) -> str:
@@ -44,6 +92,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+   __slots__ = ()
+
    def __init__(self,
                  tag : str|None,
                  value : str,
@@ -51,15 +101,17 @@ class LeafNode(HTMLNode):
                  ):
         super().__init__(tag, value, None, props)
 
-   def to_html(self):
+   def _render(self, write):
         if not self.value and not(self.tag == "img"):
             raise ValueError(f"All leaf nodes MUST have a value - {self}")
 
         tag_f = self._format_tag_and_props()
 
-        return f"{tag_f[0]}{self.value}{tag_f[1]}"
+        write(f"{tag_f[0]}{self.value}{tag_f[1]}")
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self,
                  tag : str|None,
                  children: List[Union["ParentNode", "LeafNode"]],
@@ -67,13 +119,15 @@ class ParentNode(HTMLNode):
                  ):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
+    def _render(self, write):
         if not self.tag:
             raise ValueError("ParentNode must have a tag")
         elif not self.children or len(self.children) == 0:
             raise ValueError("ParentNode must have children")
 
         tag_f = self._format_tag_and_props()
-        child_values = [x.to_html() for x in self.children]
-        return f"{tag_f[0]}{"".join(child_values)}{tag_f[1]}"
+        write(tag_f[0])
+        for child in self.children:
+            child._render(write)
+        write(tag_f[1])
 
@@ -0,0 +1,155 @@
+import json
+import os
+import struct
+from assets import HashCache
+from manifest import CACHE_PATH, inputs_hash
+
+IMAGE_CACHE_PATH = os.path.join(CACHE_PATH, "images.json")
+IMAGE_EXTENSIONS = {".png", ".gif", ".jpg", ".jpeg", ".webp"}
+
+# added to every rendered <img>, whether or not its size is known
+LAZY_ATTRIBUTES = {"loading": "lazy", "decoding": "async"}
+
+
+def _png_size(f) -> tuple[int, int]|None:
+    header = f.read(24)
+    if len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _gif_size(f) -> tuple[int, int]|None:
+    header = f.read(10)
+    if len(header) < 10 or header[:6] not in (b"GIF87a", b"GIF89a"):
+        return None
+    return struct.unpack("<HH", header[6:10])
+
+
+def _webp_size(f) -> tuple[int, int]|None:
+    header = f.read(30)
+    if len(header) < 30 or header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+        return None
+    chunk = header[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        bits = int.from_bytes(header[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+    return None
+
+
+# Start-of-frame markers hold the size; C4 (DHT), C8 (JPG) and CC (DAC) share
+# the range but are not frames.
+_JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+# Walks the segment headers up to the first frame, seeking over everything
+# else (EXIF thumbnails included) without reading it.
+def _jpeg_size(f) -> tuple[int, int]|None:
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # standalone markers carry no length
+            continue
+        if marker == 0xD9:
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack(">H", length)[0]
+        if marker in _JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+_READERS = {
+    ".png": _png_size,
+    ".gif": _gif_size,
+    ".webp": _webp_size,
+    ".jpg": _jpeg_size,
+    ".jpeg": _jpeg_size,
+}
+
+
+# Intrinsic (width, height) of a PNG, GIF, JPEG or WebP image, read from its
+# header alone. None for anything unrecognised or truncated.
+def image_size(path: str) -> tuple[int, int]|None:
+    reader = _READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        return None
+    with open(path, "rb") as f:
+        return reader(f)
+
+
+################################################################################
+# Root-relative URLs of the images under static/ mapped to their intrinsic
+# sizes. convert.text_node_to_html_node asks it for the extra attributes of
+# every <img> it renders; key changes whenever any size does.
+#
+# images = ImageSizes({"/images/tom.png": (928, 468)})
+# images.attributes("/images/tom.png")
+# # {"width": "928", "height": "468", "loading": "lazy", "decoding": "async"}
+################################################################################
+class ImageSizes:
+    def __init__(self, sizes: dict[str, tuple[int, int]]):
+        self.sizes = sizes
+        self.key = inputs_hash(*(f"{url}={w}x{h}" for url, (w, h) in sorted(sizes.items())))
+
+    def attributes(self, url: str) -> dict[str, str]:
+        size = self.sizes.get(url)
+        if size is None:
+            return dict(LAZY_ATTRIBUTES)
+        return {"width": str(size[0]), "height": str(size[1]), **LAZY_ATTRIBUTES}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ImageSizes) and self.sizes == other.sizes
+
+
+# Measures every image under source. Sizes are cached by content hash (the
+# hashes themselves are cached by size and mtime, see assets.HashCache), so an
+# unchanged library costs a stat per file.
+def measure_images(source: str, hashes: HashCache, cache_path: str = IMAGE_CACHE_PATH) -> ImageSizes:
+    cached = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cached = json.load(f)
+    measured = {}
+    sizes = {}
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            path = os.path.join(dirpath, name)
+            digest = hashes.digest(path)
+            size = cached[digest] if digest in cached else image_size(path)
+            measured[digest] = size
+            if size is not None:
+                rel_path = os.path.relpath(path, source).replace(os.sep, "/")
+                sizes["/" + rel_path] = tuple(size)
+    if measured != cached:
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(measured, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, cache_path)
+    return ImageSizes(sizes)
@@ -0,0 +1,110 @@
+import re
+from textnode import TextNode, TextType as T
+
+# everything that can open an inline element. A link or image with no
+# brackets in its label and no parentheses in its url (every one in ordinary
+# text) is matched whole, in the same search; that part of the pattern stops
+# at the first bracket or parenthesis it should not see, so it never scans
+# past the next opener. Anything else is left to _bracket.
+_OPENER = re.compile(r"(!?)\[([^\[\]]*)\]\(([^()]*)\)|\*\*|[_`!\[]")
+
+_DELIMITERS = {
+    "**": T.BOLD,
+    "_": T.ITALIC,
+    "`": T.CODETEXT,
+}
+
+
+################################################################################
+# str.find with a memory: remembers the next occurrence of each needle so that
+# repeated searches from increasing start positions never rescan the same
+# characters. This is what keeps tokenize_inline linear when the text is full
+# of openers that never close (e.g. "[[[[[[...").
+################################################################################
+class _Finder:
+    def __init__(self, text: str):
+        self.text = text
+        self.next = {}
+
+    def find(self, needle: str, start: int) -> int:
+        pos = self.next.get(needle)
+        if pos is None or (pos != -1 and pos < start):
+            pos = self.text.find(needle, start)
+            self.next[needle] = pos
+        return pos
+
+
+# Parses "[label](url)" starting at the "[" at position i.
+# Returns (label, url, end) or None if there is no well-formed link there.
+def _bracket(text: str, finder: _Finder, i: int):
+    close = finder.find("]", i + 1)
+    if close == -1 or text[close + 1:close + 2] != "(":
+        return None
+    end = finder.find(")", close + 2)
+    if end == -1:
+        return None
+    return text[i + 1:close], text[close + 2:end], end + 1
+
+
+################################################################################
+# Turns a line of inline markdown into TextNodes in a single left-to-right
+# scan. Whichever opener comes first wins, and the contents of bold, italic
+# and code spans are taken literally, as are link and image labels. Every
+# character is examined a bounded number of times, so the cost is linear in
+# len(text) however many links or stray brackets it contains.
+#
+# tokenize_inline("a **b** [c](d)")
+# -> [TextNode(a , normal), TextNode(b, bold), TextNode( , normal), TextNode(c, link, d)]
+################################################################################
+def tokenize_inline(text: str) -> list[TextNode]:
+    nodes = []
+    finder = _Finder(text)
+    plain_start = 0
+    i = 0
+    # looked up once: this loop runs once per opener
+    search = _OPENER.search
+    normal, link, image = T.NORMAL, T.LINK, T.IMAGE
+    while True:
+        m = search(text, i)
+        if not m:
+            break
+        i = m.start()
+        token = m.group()
+        bang, label, url = m.groups()
+
+        if label is not None:
+            node = TextNode(label, image if bang else link, url)
+            end = m.end()
+        elif token in _DELIMITERS:
+            close = finder.find(token, i + len(token))
+            if close == -1:
+                raise Exception(f"unmatched delimiters: {token}, invalid markdown")
+            node = None
+            if close > i + len(token):
+                node = TextNode(text[i + len(token):close], _DELIMITERS[token])
+            end = close + len(token)
+        elif token == "!":
+            parsed = _bracket(text, finder, i + 1) if text[i + 1:i + 2] == "[" else None
+            if parsed is None:
+                i += 1
+                continue
+            alt, url, end = parsed
+            node = TextNode(alt, image, url)
+        else:
+            # "[" directly after a "!" belongs to a failed image, not a link
+            parsed = _bracket(text, finder, i) if i == 0 or text[i - 1] != "!" else None
+            if parsed is None:
+                i += 1
+                continue
+            anchor, url, end = parsed
+            node = TextNode(anchor, link, url)
+
+        if i > plain_start:
+            nodes.append(TextNode(text[plain_start:i], normal))
+        if node is not None:
+            nodes.append(node)
+        plain_start = i = end
+
+    if plain_start < len(text):
+        nodes.append(TextNode(text[plain_start:], T.NORMAL))
+    return nodes
@@ -1,47 +1,448 @@
+import argparse
 import os
 import sys
-from shutil import copy, rmtree
-from convert import generate_page
-
-def copy_dir_recursive(source: str, dest: str):
-    print(f"{source} to {dest}")
-    if os.path.exists(dest):
-        print(f"Clearing {dest}")
-        rmtree(dest)
-    os.mkdir(dest)
-    dir_entries = os.scandir(source)
-    for e in dir_entries:
-        if e.is_dir():
-            print(f"Directory {source}/{e.name}")
-            os.mkdir(f"{dest}/{e.name}")
-            copy_dir_recursive(f"{source}/{e.name}", f"{dest}/{e.name}")
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from shutil import rmtree
+from archive import ArchiveWriter, is_archive
+from assets import AssetMap, HashCache, PUBLISHED_ASSET_MAP, fingerprint_assets, static_files, sync_dir
+from build import CONTENT_PATH, STATIC_ASSETS_PATH, TEMPLATE_PATH, WEB_PATH, PageError, RenderSettings
+from compress import CODECS, compress_outputs
+from content_cache import CONTENT_CACHE_PATH, ContentCache
+from convert import generate_page, INLINE_CACHE_SIZE
+from images import measure_images
+from manifest import Manifest, SqliteManifest, MANIFEST_PATH, SQLITE_MANIFEST_PATH
+from output import default_writer
+from profiling import BuildSummary, PageProfile, write_report, print_summary, print_build_summary
+from shard import SHARDS_PATH, MergeError, merge_shards, parse_shard, read_shards, shard_dir, shard_of, write_shard_manifest
+
+# slowest page profiles a memory-budgeted build keeps for --profile
+BUDGET_PROFILES_KEPT = 1000
+
+
+def page_filename(name: str) -> str:
+    return name.replace(".md", ".html")
+
+def _listing(path: str) -> list[tuple[str, bool]]:
+    with os.scandir(path) as dir_entries:
+        return sorted((e.name, e.is_dir()) for e in dir_entries)
+
+# Yields (source, dest) for every page under content, depth first in name
+# order, creating the matching directories under publish unless make_dirs is
+# False. Iterative, so however deep the tree, only one (name, is_dir) listing
+# per level is held and no directory handle stays open between pages.
+def walk_pages(content: str, publish: str, make_dirs: bool = True):
+    stack = [(content, publish, iter(_listing(content)))]
+    while stack:
+        content, publish, entries = stack[-1]
+        for name, is_dir in entries:
+            if is_dir:
+                print(f"Directory {content}/{name}")
+                if make_dirs:
+                    os.makedirs(f"{publish}/{name}", exist_ok=True)
+                sub_content = os.path.join(content, name)
+                stack.append((sub_content, os.path.join(publish, name), iter(_listing(sub_content))))
+                break
+            print(f"File: {content}/{name}")
+            yield f"{content}/{name}", f"{publish}/{page_filename(name)}"
         else:
-            print(f"File: {source}/{e.name}")
-            copy(f"{source}/{e.name}", f"{dest}/{e.name}")
-
-def generate_page_recursive(content: str, template: str, publish: str, basepath: str):
-    dir_entries = os.scandir(content)
-    for e in dir_entries:
-        if e.is_dir():
-            print(f"Directory {content}/{e.name}")
-            os.makedirs(f"{publish}/{e.name}", exist_ok=True)
-            generate_page_recursive(os.path.join(content, e.name), template, os.path.join(publish, e.name), basepath)
+            stack.pop()
+
+
+# top-level so it can be pickled over to pool workers
+def _generate_page_job(settings: RenderSettings, page: tuple[str, str]) -> PageProfile:
+    from_path, dest_path = page
+    settings.apply()
+    try:
+        profile = PageProfile(from_path, dest_path, settings.profile)
+        content_cache = ContentCache(settings.content_cache) if settings.content_cache else None
+        return generate_page(from_path, settings.template, dest_path, False, settings.basepath, profile,
+                             assets=settings.assets, minify=settings.minify, content_cache=content_cache,
+                             stream_threshold=settings.stream_threshold())
+    except Exception as e:
+        raise PageError(from_path, f"{type(e).__name__}: {e}") from e
+
+
+# A chunk of pages for one pool worker, which checks its own memory budget as
+# it goes.
+def _generate_chunk_job(settings: RenderSettings, pages: list[tuple[str, str]]) -> list[PageProfile]:
+    from memory import MemoryBudget
+    budget = MemoryBudget(settings.memory_budget)
+    profiles = []
+    for page in pages:
+        profiles.append(_generate_page_job(settings, page))
+        budget.tick()
+    return profiles
+
+
+# Renders (from_path, dest_path) pairs, fanning them out over a process pool
+# when jobs > 1. Results are consumed in input order, so the first failing
+# page (in walk order) is the one reported, whatever order workers finish in.
+# With settings.io, reading and writing overlap rendering (see pipeline.py),
+# and pages may be any iterable: it is walked as the pipeline reads ahead.
+# Given a writer (an archive.ArchiveWriter), every page goes through it, in
+# walk order.
+def generate_pages(pages, settings: RenderSettings, jobs: int = 1, writer=None) -> list[PageProfile]:
+    if settings.io > 0 or writer is not None:
+        from pipeline import run_pipeline
+        return run_pipeline(pages, settings, settings.io or 1, jobs, writer=writer, writers=1 if writer is not None else None)
+    pages = list(pages)
+    job = partial(_generate_page_job, settings)
+    if jobs <= 1 or len(pages) <= 1:
+        return [job(page) for page in pages]
+    chunksize = max(1, len(pages) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(job, pages, chunksize=chunksize))
+
+
+################################################################################
+# Renders pages as they are walked, into a BuildSummary rather than a list of
+# profiles, so nothing the build holds grows with the number of pages. With
+# jobs > 1 at most jobs * 4 chunks are in flight at a time; results are still
+# consumed in walk order, so the first failing page is the one reported.
+# Every process checks settings.memory_budget as it goes (see memory.py).
+#
+# summary = stream_pages(walk_pages("content", "docs"), settings, jobs=4,
+#                        summary=BuildSummary(keep=1000))
+################################################################################
+def stream_pages(pages, settings: RenderSettings, jobs: int = 1, summary: BuildSummary|None = None, writer=None) -> BuildSummary:
+    from memory import MemoryBudget
+    summary = summary if summary is not None else BuildSummary()
+    if settings.io > 0 or writer is not None:
+        from pipeline import run_pipeline
+        return run_pipeline(pages, settings, settings.io or 1, jobs, writer=writer, summary=summary,
+                            writers=1 if writer is not None else None)
+    if jobs <= 1:
+        settings.apply()
+        budget = MemoryBudget(settings.memory_budget)
+        for page in pages:
+            summary.add(_generate_page_job(settings, page))
+            budget.tick()
+        return summary
+    pages = iter(pages)
+    job = partial(_generate_chunk_job, settings)
+    in_flight = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while True:
+            while len(in_flight) < jobs * 4:
+                chunk = list(islice(pages, 16))
+                if not chunk:
+                    break
+                in_flight.append(pool.submit(job, chunk))
+            if not in_flight:
+                return summary
+            for profile in in_flight.pop(0).result():
+                summary.add(profile)
+
+
+# (from_path, dest_path, key) for pages, in order, each key the manifest's
+# page_key for from_path. With threads, sources are hashed over that many
+# threads, at most threads * 4 pages ahead of the one yielded.
+def _keyed_pages(pages, manifest: Manifest, threads: int = 0):
+    if threads <= 0:
+        for from_path, dest_path in pages:
+            yield from_path, dest_path, manifest.page_key(from_path)
+        return
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ssg-hash") as pool:
+        ahead = deque()
+        for page in pages:
+            ahead.append((page, pool.submit(manifest.page_key, page[0])))
+            if len(ahead) >= threads * 4:
+                page, key = ahead.popleft()
+                yield page[0], page[1], key.result()
+        while ahead:
+            page, key = ahead.popleft()
+            yield page[0], page[1], key.result()
+
+
+# (from_path, dest_path) for every page that needs rendering, of the given
+# (index, count) shard if any, recording each in the manifest on the way.
+# hash_threads hash sources ahead of the walk (see _keyed_pages), for the
+# pipelined build, where the walk is its feeder's and slow I/O is expected.
+def _pending_pages(content: str, publish: str, manifest: Manifest|None, incremental: bool, shard: tuple[int, int]|None = None,
+                   make_dirs: bool = True, hash_threads: int = 0):
+    pages = walk_pages(content, publish, make_dirs)
+    if shard is not None:
+        pages = ((from_path, dest_path) for from_path, dest_path in pages
+                 if shard_of(os.path.relpath(from_path, content), shard[1]) == shard[0])
+    if manifest is None:
+        yield from pages
+        return
+    for from_path, dest_path, key in _keyed_pages(pages, manifest, hash_threads):
+        manifest.record(from_path, dest_path, key)
+        if incremental and manifest.is_fresh(dest_path, key):
+            print(f"Unchanged, skipping {dest_path}")
+            continue
+        yield from_path, dest_path
+
+
+# With a summary the pages are streamed into it (see stream_pages) and it is
+# returned in place of the list of profiles. Given a writer (see --archive),
+# nothing is created under publish.
+def generate_page_recursive(content: str, template: str, publish: str, basepath: str, manifest: Manifest|None = None, jobs: int = 1, incremental: bool = False, settings: RenderSettings|None = None, summary: BuildSummary|None = None, shard: tuple[int, int]|None = None, writer=None) -> list[PageProfile]|BuildSummary:
+    if settings is None:
+        settings = RenderSettings(template, basepath)
+    pages = _pending_pages(content, publish, manifest, incremental, shard, make_dirs=writer is None and shard is None,
+                           hash_threads=settings.io)
+    if summary is not None:
+        return stream_pages(pages, settings, jobs, summary, writer)
+    # not listed first: the pipeline walks (and hashes sources for the
+    # manifest) while it renders
+    return generate_pages(pages, settings, jobs, writer)
+
+
+def build_parser(description: str = "Build the site from content/ into docs/") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-render pages whose inputs changed since the last build")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="render pages over N worker processes (0 = one per CPU)")
+    parser.add_argument("--io", type=int, default=0, metavar="THREADS",
+                        help="overlap reading and writing pages with rendering them, over N I/O threads")
+    parser.add_argument("--clean", action="store_true",
+                        help="delete docs/ before building instead of syncing into it")
+    parser.add_argument("--link-assets", action="store_true",
+                        help="hardlink static/ files into docs/ instead of copying them")
+    parser.add_argument("--checksum", action="store_true",
+                        help="compare static/ files by content hash rather than size and mtime")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="time every stage of every page and write a report (.json or .csv)")
+    parser.add_argument("--inline-cache", type=int, default=INLINE_CACHE_SIZE, metavar="ENTRIES",
+                        help=f"inline fragments to memoise per process (0 disables, default {INLINE_CACHE_SIZE})")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="publish static/ files under content-hashed names and rewrite references to them")
+    parser.add_argument("--lazy-images", action="store_true",
+                        help="give <img> tags the size of the static/ image they show, and loading=lazy")
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse template whitespace, drop comments and optional attribute quotes")
+    parser.add_argument("--no-content-cache", dest="content_cache", action="store_false",
+                        help="parse every rendered page, rather than reusing content HTML from earlier builds")
+    parser.add_argument("--cache-store", metavar="DIR",
+                        help="share the content cache through DIR: import its archives first, add one of new entries after")
+    parser.add_argument("--compress", action="append", choices=sorted(CODECS), metavar="CODEC",
+                        help=f"write a precompressed sibling of every text output ({', '.join(sorted(CODECS))}; repeatable)")
+    parser.add_argument("--compress-level", type=int, metavar="LEVEL",
+                        help="compression level (default: the codec's highest)")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/N",
+                        help=f"render only the I-th of N shards of the pages, into {SHARDS_PATH}/I-of-N (see merge)")
+    parser.add_argument("--archive", metavar="FILE",
+                        help="write the site straight into FILE (.tar, .tar.gz, .tgz or .zip) rather than docs/")
+    parser.add_argument("--memory-budget", type=int, default=0, metavar="MB",
+                        help="keep each build process under MB megabytes: stream pages through, keep the manifest on disk")
+    return parser
+
+
+# Fingerprints and measures static/ as the flags ask, publishing (or
+# retracting) the asset map in publish. Returns (assets, images).
+def scan_static(args: argparse.Namespace, hashes: HashCache, publish: str|None = WEB_PATH):
+    assets = None
+    if args.fingerprint:
+        assets = fingerprint_assets(STATIC_ASSETS_PATH, hashes)
+        print(f"Fingerprinted {len(assets.urls)} assets")
+    if publish:
+        publish_asset_map(assets, publish)
+    images = None
+    if args.lazy_images:
+        images = measure_images(STATIC_ASSETS_PATH, hashes)
+        print(f"Measured {len(images.sizes)} images")
+    hashes.save()
+    return assets, images
+
+
+def publish_asset_map(assets: AssetMap|None, publish: str):
+    asset_map = os.path.join(publish, PUBLISHED_ASSET_MAP)
+    if assets is not None:
+        default_writer.write(asset_map, assets.to_json())
+    elif os.path.exists(asset_map):
+        os.remove(asset_map)
+
+
+def remove_stale(manifest: Manifest):
+    for stale in manifest.stale_outputs():
+        if os.path.exists(stale):
+            print(f"Removing stale {stale}")
+            os.remove(stale)
+
+
+def compress(args: argparse.Namespace, jobs: int, hashes: HashCache):
+    stats = compress_outputs(WEB_PATH, args.compress, args.compress_level, jobs, hashes)
+    print(f"Compressed: {stats['compressed']} written, {stats['unchanged']} unchanged, "
+          f"{stats['skipped']} not smaller, {stats['removed']} removed")
+
+
+################################################################################
+# Writes the whole site into an archive, without a docs/ tree on disk: the
+# asset map, static/ files and then every page in walk order, each straight
+# into the archive, with their compressed siblings if asked for. Pages are
+# always rendered in full (there is nothing on disk to be incremental
+# against); the content cache still saves re-parsing them.
+################################################################################
+def build_archive(args: argparse.Namespace, settings: RenderSettings, jobs: int, summary: BuildSummary|None):
+    if not is_archive(args.archive):
+        sys.exit(f"--archive must end in .tar, .tar.gz, .tgz or .zip: {args.archive}")
+    settings.io = settings.io or 1
+    with ArchiveWriter(args.archive, WEB_PATH, args.compress, args.compress_level) as archive:
+        if settings.assets:
+            archive.write(os.path.join(WEB_PATH, PUBLISHED_ASSET_MAP), settings.assets.to_json())
+        for source_path, rel_path in static_files(STATIC_ASSETS_PATH, settings.assets):
+            archive.add_file(os.path.join(WEB_PATH, rel_path), source_path)
+        assets = archive.written
+        profiles = generate_page_recursive(CONTENT_PATH, TEMPLATE_PATH, WEB_PATH, args.basepath, jobs=jobs,
+                                           settings=settings, summary=summary, writer=archive)
+    print(f"Archived {assets} assets and {archive.written - assets} pages into {args.archive}")
+    return profiles
+
+
+# With --shard, only the shard's pages are rendered, into their own directory
+# under shards/ and with their own manifest; static/ and compression are left
+# to the merge command, which puts the shards together in docs/.
+def build(args: argparse.Namespace):
+    basepath = args.basepath
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    shard = getattr(args, "shard", None)
+    if shard and args.archive:
+        sys.exit("--archive cannot be combined with --shard; archive the merged site instead")
+    publish = shard_dir(*shard) if shard else WEB_PATH
+    if args.clean and not args.archive and os.path.exists(publish):
+        print(f"Clearing {publish}")
+        rmtree(publish)
+    hashes = HashCache()
+    assets, images = scan_static(args, hashes, None if shard or args.archive else publish)
+    store_keys = set()
+    if args.content_cache and args.cache_store:
+        imported, store_keys = ContentCache(CONTENT_CACHE_PATH).pull(args.cache_store)
+        print(f"Cache store: {imported} entries imported from {args.cache_store}")
+    memory_budget = args.memory_budget * 1024 * 1024
+    settings = RenderSettings(TEMPLATE_PATH, basepath, bool(args.profile), args.inline_cache, assets, images, args.minify,
+                              CONTENT_CACHE_PATH if args.content_cache else None, args.io, memory_budget)
+    summary = BuildSummary(keep=BUDGET_PROFILES_KEPT) if memory_budget else None
+    if args.archive:
+        profiles = build_archive(args, settings, jobs, summary)
+    else:
+        if memory_budget:
+            manifest_path = SQLITE_MANIFEST_PATH
+            manifest_class = SqliteManifest
         else:
-            print(f"File: {content}/{e.name}")
-            new_filename = e.name.replace(".md", ".html")
-            generate_page(f"{content}/{e.name}", template, f"{publish}/{new_filename}", False, basepath)
+            manifest_path = MANIFEST_PATH
+            manifest_class = Manifest
+        if shard:
+            base, ext = os.path.splitext(manifest_path)
+            manifest_path = f"{base}-{shard[0]}-of-{shard[1]}{ext}"
+        manifest = manifest_class(manifest_path, TEMPLATE_PATH, basepath, assets, images, args.minify)
+        if not shard:
+            stats = sync_dir(STATIC_ASSETS_PATH, publish, link=args.link_assets, checksum=args.checksum, assets=assets)
+            print(f"Assets: {stats['copied']} copied, {stats['unchanged']} unchanged, {stats['removed']} removed")
+        profiles = generate_page_recursive(CONTENT_PATH, TEMPLATE_PATH, publish, basepath, manifest, jobs, args.incremental,
+                                           settings, summary, shard)
+        remove_stale(manifest)
+        if shard:
+            write_shard_manifest(publish, CONTENT_PATH, shard, manifest)
+            print(f"Shard {shard[0]} of {shard[1]} written to {publish}")
+        manifest.save()
+    if args.content_cache:
+        pruned = ContentCache(CONTENT_CACHE_PATH).prune()
+        if pruned:
+            print(f"Pruned {pruned} unused content cache entries")
+        if args.cache_store:
+            pushed = ContentCache(CONTENT_CACHE_PATH).push(args.cache_store, store_keys)
+            print(f"Cache store: {pushed} entries exported to {args.cache_store}")
+    if args.compress and not shard and not args.archive:
+        compress(args, jobs, hashes)
+    if args.profile:
+        write_report(profiles, args.profile)
+        print_summary(profiles)
+        print(f"Profile written to {args.profile}")
+    print_build_summary(profiles, page_cache=bool(args.content_cache))
+
+
+# Puts the outputs of --shard builds together into docs/, as a plain build
+# would have written it. Takes the same flags the shards were built with.
+def merge_command(argv: list[str]):
+    parser = build_parser("Merge the outputs of --shard builds into docs/")
+    parser.add_argument("--shards", default=SHARDS_PATH, metavar="DIR",
+                        help=f"directory holding the shard outputs (default {SHARDS_PATH})")
+    args = parser.parse_args(argv)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    hashes = HashCache()
+    # nothing is written to docs/ (not even the asset map) until the shards
+    # have passed merge_shards' checks
+    assets, images = scan_static(args, hashes, publish=None)
+    manifest = Manifest(MANIFEST_PATH, TEMPLATE_PATH, args.basepath, assets, images, args.minify)
+    shards = read_shards(args.shards)
+    try:
+        written = merge_shards(shards, walk_pages(CONTENT_PATH, WEB_PATH, make_dirs=False), WEB_PATH, CONTENT_PATH,
+                               manifest, clean=args.clean)
+    except MergeError as e:
+        sys.exit(str(e))
+    publish_asset_map(assets, WEB_PATH)
+    pages = sum(len(s["pages"]) for s in shards)
+    print(f"Merged {len(shards)} shards: {written} pages written, {pages - written} unchanged")
+    stats = sync_dir(STATIC_ASSETS_PATH, WEB_PATH, link=args.link_assets, checksum=args.checksum, assets=assets)
+    print(f"Assets: {stats['copied']} copied, {stats['unchanged']} unchanged, {stats['removed']} removed")
+    remove_stale(manifest)
+    manifest.save()
+    if args.compress:
+        compress(args, jobs, hashes)
+
+
+def serve_command(argv: list[str]):
+    from server import serve
+    parser = build_parser("Build the site, then serve docs/ over HTTP")
+    parser.add_argument("--watch", action="store_true",
+                        help="rebuild changed pages and assets and reload open browsers")
+    parser.add_argument("--port", type=int, default=8888)
+    args = parser.parse_args(argv)
+    args.incremental = True
+    build(args)
+    serve(args)
+
+
+# Renders pages from content/ as they are requested, without building docs/.
+def preview_command(argv: list[str]):
+    from preview import preview, PAGE_CACHE_SIZE
+    parser = argparse.ArgumentParser(description="Serve pages rendered on demand from content/, without building")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--minify", action="store_true",
+                        help="collapse template whitespace, drop comments and optional attribute quotes")
+    parser.add_argument("--page-cache", type=int, default=PAGE_CACHE_SIZE, metavar="PAGES",
+                        help=f"rendered pages to keep in memory (default {PAGE_CACHE_SIZE})")
+    preview(parser.parse_args(argv))
+
+
+# Moves the content cache between machines as a single archive.
+def cache_command(argv: list[str]):
+    parser = argparse.ArgumentParser(description="Export the content cache to an archive, or import one")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("archive", help="a .tar.gz file")
+    args = parser.parse_args(argv)
+    cache = ContentCache(CONTENT_CACHE_PATH)
+    if args.action == "export":
+        print(f"Exported {cache.export(args.archive)} entries to {args.archive}")
+    else:
+        imported, keys = cache.import_archive(args.archive)
+        print(f"Imported {imported} of {len(keys)} entries from {args.archive}")
+
+
+# subcommands; anything else on the command line is a plain build
+COMMANDS = {
+    "serve": serve_command,
+    "preview": preview_command,
+    "merge": merge_command,
+    "cache": cache_command,
+}
 
 
 def main():
     print(sys.argv)
-    if len(sys.argv) >= 2:
-        basepath = sys.argv[1]
-    else:
-        basepath = '/'
-    STATIC_ASSETS_PATH = "static"
-    WEB_PATH = "docs"
-    copy_dir_recursive(STATIC_ASSETS_PATH, WEB_PATH)
-    generate_page_recursive("content", "template.html", WEB_PATH, basepath)
+    argv = sys.argv[1:]
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+        return
+    build(build_parser().parse_args(argv))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+from template import load_template
+
+# Bump this whenever a change to the generator alters the bytes it writes,
+# so incremental builds throw away everything rendered by the old code.
+GENERATOR_VERSION = "1"
+
+CACHE_PATH = ".ssg-cache"
+MANIFEST_PATH = os.path.join(CACHE_PATH, "manifest.json")
+SQLITE_MANIFEST_PATH = os.path.join(CACHE_PATH, "manifest.sqlite")
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def inputs_hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+################################################################################
+# Records, for every generated page, a hash of everything that went into it:
+# the markdown source, the template (and the asset map its URLs are rewritten
+# through, the image sizes its <img> tags are given and whether it is
+# minified), the basepath and the generator version.
+# A page whose inputs hash matches the previous build (and whose output is
+# still on disk) does not need to be rendered again.
+#
+# manifest = Manifest(MANIFEST_PATH, "template.html", "/")
+# key = manifest.page_key("content/index.md")
+# if not manifest.is_fresh("docs/index.html", key):
+#     generate_page(...)
+# manifest.record("content/index.md", "docs/index.html", key)
+# manifest.save()
+################################################################################
+class Manifest:
+    def __init__(self, path: str, template_path: str, basepath: str, assets=None, images=None, minify: bool = False):
+        self.path = path
+        # partials included by the template count as template input too
+        self.template_hash = inputs_hash(*(file_hash(p) for p in load_template(template_path).dependencies))
+        if assets:
+            self.template_hash = inputs_hash(self.template_hash, assets.key)
+        if images is not None:
+            self.template_hash = inputs_hash(self.template_hash, "images", images.key)
+        if minify:
+            self.template_hash = inputs_hash(self.template_hash, "minify")
+        self.basepath = basepath
+        self._load()
+
+    def _load(self):
+        self.previous = {}
+        self.current = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == GENERATOR_VERSION:
+                self.previous = data.get("pages", {})
+
+    def page_key(self, source_path: str) -> str:
+        return inputs_hash(
+            file_hash(source_path), self.template_hash, self.basepath, GENERATOR_VERSION
+        )
+
+    def is_fresh(self, dest_path: str, key: str) -> bool:
+        entry = self.previous.get(dest_path)
+        return entry is not None and entry["key"] == key and os.path.exists(dest_path)
+
+    def record(self, source_path: str, dest_path: str, key: str):
+        self.current[dest_path] = {"source": source_path, "key": key}
+
+    # (dest, source, key) of every page recorded by this build, by dest
+    def records(self):
+        for dest in sorted(self.current):
+            yield dest, self.current[dest]["source"], self.current[dest]["key"]
+
+    # outputs written by the previous build whose source has since disappeared
+    def stale_outputs(self) -> list[str]:
+        return sorted(d for d in self.previous if d not in self.current)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": GENERATOR_VERSION, "pages": self.current}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+################################################################################
+# The same records as Manifest, kept in an SQLite file instead of two dicts,
+# so the memory a build needs does not grow with the number of pages. Every
+# record of a build goes into one transaction: a build that dies part way
+# leaves the previous build's records as they were.
+#
+# Each row holds the key of the last saved build (prev_key) next to the key
+# being recorded now, and the build it was last recorded in, which is how
+# stale outputs are told apart.
+################################################################################
+class SqliteManifest(Manifest):
+    def _load(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # records come from the pipeline's feeder thread (see pipeline.py)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages (dest TEXT PRIMARY KEY, source TEXT, prev_key TEXT, key TEXT, build INTEGER)")
+        meta = dict(self.db.execute("SELECT name, value FROM meta"))
+        if meta.get("version") != GENERATOR_VERSION:
+            self.db.execute("DELETE FROM pages")
+        self.build = int(meta.get("build", 0)) + 1
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (GENERATOR_VERSION,))
+
+    def is_fresh(self, dest_path: str, key: str) -> bool:
+        row = self.db.execute("SELECT prev_key FROM pages WHERE dest = ?", (dest_path,)).fetchone()
+        return row is not None and row[0] == key and os.path.exists(dest_path)
+
+    def record(self, source_path: str, dest_path: str, key: str):
+        self.db.execute(
+            "INSERT INTO pages VALUES (?, ?, NULL, ?, ?) "
+            "ON CONFLICT (dest) DO UPDATE SET source = excluded.source, key = excluded.key, build = excluded.build",
+            (dest_path, source_path, key, self.build))
+
+    def records(self):
+        yield from self.db.execute("SELECT dest, source, key FROM pages WHERE build = ? ORDER BY dest", (self.build,))
+
+    # a generator: the rows are read as the caller goes
+    def stale_outputs(self):
+        for (dest,) in self.db.execute("SELECT dest FROM pages WHERE build != ? ORDER BY dest", (self.build,)):
+            yield dest
+
+    def save(self):
+        self.db.execute("DELETE FROM pages WHERE build != ?", (self.build,))
+        self.db.execute("UPDATE pages SET prev_key = key")
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('build', ?)", (str(self.build),))
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,58 @@
+import gc
+import os
+from convert import inline_cache
+
+# pages rendered between two looks at the RSS
+CHECK_EVERY = 64
+
+
+# Resident set size of this process in bytes. Read from /proc where there is
+# one; elsewhere the peak RSS is the best there is.
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+################################################################################
+# Keeps a build process under a memory budget. Call tick() once per page:
+# every CHECK_EVERY pages the RSS is read, and if it is over the limit the
+# inline fragment cache (which refills itself) is dropped and a collection is
+# forced. A build still over the limit after that is warned about once; it is
+# never stopped.
+#
+# budget = MemoryBudget(512 * 1024 * 1024)
+# for page in pages:
+#     ...
+#     budget.tick()
+################################################################################
+class MemoryBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.pages = 0
+        self.peak = 0
+        self.trims = 0
+        self.warned = False
+
+    def tick(self):
+        self.pages += 1
+        if self.pages % CHECK_EVERY == 0:
+            self.check()
+
+    def check(self):
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        if rss <= self.limit:
+            return
+        inline_cache.clear()
+        gc.collect()
+        self.trims += 1
+        if not self.warned and current_rss() > self.limit:
+            self.warned = True
+            print(f"Warning: RSS {rss // (1 << 20)} MiB is over the {self.limit // (1 << 20)} MiB memory budget")
@@ -0,0 +1,104 @@
+import re
+
+# elements whose contents are whitespace-sensitive or not HTML at all
+_RAW_OPEN = re.compile(r"<(pre|code|textarea|script|style)\b", re.I)
+# conditional comments (<!--[if IE]>) are markup, not comments
+_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.S)
+# whitespace between two tags, with both tags' names
+_BETWEEN_TAGS = re.compile(r"(</?([a-z!][^\s/<>]*)[^<>]*>)\s+(?=</?([a-z!][^\s/<>]*))", re.I)
+# elements that start and end a line of their own, so whitespace next to
+# them is never rendered
+_BLOCK = {"!doctype", "address", "article", "aside", "base", "blockquote", "body", "caption", "col", "colgroup",
+          "dd", "details", "dialog", "div", "dl", "dt", "fieldset", "figcaption", "figure", "footer", "form",
+          "h1", "h2", "h3", "h4", "h5", "h6", "head", "header", "hgroup", "hr", "html", "legend", "li", "link",
+          "main", "menu", "meta", "nav", "noscript", "ol", "option", "p", "pre", "script", "section", "style",
+          "summary", "table", "tbody", "td", "template", "tfoot", "th", "thead", "title", "tr", "ul"}
+_WHITESPACE = re.compile(r"\s+")
+_TAG = re.compile(r"<[^<>]*>")
+# a quoted attribute value that means the same without its quotes
+# (not before a "/", which would then be read as part of the value)
+_QUOTED_ATTRIBUTE = re.compile(r"""(\s[^\s"'=<>/]+)="([^\s"'=<>`]+)"(?!/)""")
+_UNQUOTED_VALUE = re.compile(r"""[^\s"'=<>`]+""")
+
+
+# Whether an attribute value can be written without quotes.
+def can_unquote(value: str) -> bool:
+    return _UNQUOTED_VALUE.fullmatch(value) is not None
+
+
+def _drop_quotes(tag: re.Match) -> str:
+    return _QUOTED_ATTRIBUTE.sub(r"\1=\2", tag.group())
+
+
+def _between_tags(m: re.Match) -> str:
+    if m.group(2).lower() in _BLOCK or m.group(3).lower() in _BLOCK:
+        return m.group(1)
+    return m.group(1) + " "
+
+
+# Whitespace between two tags goes entirely when either is a block-level
+# element's (indentation, blank lines between elements); any other run of
+# whitespace becomes one space, so "<a>Home</a>\n<a>Blog</a>" still shows
+# two words and text keeps apart from the elements next to it.
+def _minify_markup(text: str) -> str:
+    text = _COMMENT.sub("", text)
+    text = _BETWEEN_TAGS.sub(_between_tags, text)
+    text = _WHITESPACE.sub(" ", text)
+    return _TAG.sub(_drop_quotes, text)
+
+
+# Markup between raw elements, minified as if the tags it sits between (a
+# raw element's close tag before it, the start of its open tag after it) were
+# still attached.
+def _minify_around(text: str, after_tag: str, before_tag: str) -> str:
+    text = _minify_markup(after_tag + text + before_tag)
+    return text[len(after_tag):len(text) - len(before_tag)]
+
+
+################################################################################
+# Minifies the literal parts of a compiled template: comments are dropped,
+# inter-tag whitespace collapsed (and any before or after the document
+# dropped) and optional attribute quotes removed. The
+# contents of <pre>, <code>, <textarea>, <script> and <style> are left exactly
+# as they are, even when a slot sits between their open and close tags.
+# Runs once, when the template is compiled; rendered pages are never parsed.
+#
+# minify_segments(['<ul>\n  <li class="a">', Slot("X", ""), "</li>\n</ul>\n"])
+# # ['<ul><li class=a>', Slot("X"), '</li></ul>']
+################################################################################
+def minify_segments(segments: list) -> list:
+    minified = []
+    raw_tag = None
+    for segment in segments:
+        if not isinstance(segment, str):
+            minified.append(segment)
+            continue
+        parts = []
+        pos = 0
+        # the raw element's close tag that ended at pos
+        closed = ""
+        while pos < len(segment):
+            if raw_tag is None:
+                m = _RAW_OPEN.search(segment, pos)
+                if m is None:
+                    parts.append(_minify_around(segment[pos:], closed, ""))
+                    break
+                parts.append(_minify_around(segment[pos:m.start()], closed, m.group()))
+                raw_tag = m.group(1).lower()
+                pos = m.start()
+            close = segment.lower().find(f"</{raw_tag}", pos)
+            if close == -1:
+                parts.append(segment[pos:])
+                break
+            end = segment.find(">", close)
+            end = len(segment) if end == -1 else end + 1
+            parts.append(segment[pos:end])
+            closed = segment[close:end]
+            raw_tag = None
+            pos = end
+        minified.append("".join(parts))
+    if minified and isinstance(minified[0], str) and not _RAW_OPEN.match(minified[0].lstrip()):
+        minified[0] = minified[0].lstrip()
+    if minified and isinstance(minified[-1], str) and raw_tag is None:
+        minified[-1] = minified[-1].rstrip()
+    return minified
@@ -0,0 +1,93 @@
+import filecmp
+import os
+from contextlib import contextmanager
+
+# directories remembered as created; past this the set starts over, so a site
+# with millions of directories does not hold all their names
+MAX_KNOWN_DIRS = 4096
+
+
+def _same_contents(path: str, data: bytes) -> bool:
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        with open(path, "rb") as f:
+            pos = 0
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                if data[pos:pos + len(chunk)] != chunk:
+                    return False
+                pos += len(chunk)
+        return pos == len(data)
+    except FileNotFoundError:
+        return False
+
+
+################################################################################
+# Writes build outputs only when their bytes actually change. Unchanged files
+# keep their mtime (so rsync and CDN invalidation skip them), changed ones are
+# replaced atomically via a temp file and a rename, so a reader never sees a
+# half-written page. Directories are created once per writer rather than on
+# every call.
+#
+# writer = OutputWriter()
+# writer.write("docs/index.html", html)   # True if the file changed
+# with writer.open_text("docs/big.html") as f:
+#     f.write(...)
+################################################################################
+class OutputWriter:
+    def __init__(self):
+        self._dirs = set()
+        self.written = 0
+        self.unchanged = 0
+
+    def ensure_dir(self, path: str):
+        if path and path not in self._dirs:
+            os.makedirs(path, exist_ok=True)
+            if len(self._dirs) >= MAX_KNOWN_DIRS:
+                self._dirs.clear()
+            self._dirs.add(path)
+
+    def _temp_path(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        self.ensure_dir(directory)
+        if directory and not os.path.isdir(directory):
+            # removed behind our back (e.g. while a dev server is running)
+            self._dirs.discard(directory)
+            self.ensure_dir(directory)
+        return f"{path}.{os.getpid()}.tmp"
+
+    def write(self, path: str, data: bytes|str) -> bool:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if _same_contents(path, data):
+            self.unchanged += 1
+            return False
+        tmp_path = self._temp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.written += 1
+        return True
+
+    # For outputs too big to hold in memory: written to a temp file, which
+    # replaces path only if it differs from what is already there.
+    @contextmanager
+    def open_text(self, path: str):
+        tmp_path = self._temp_path(path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                yield f
+            if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+                os.remove(tmp_path)
+                self.unchanged += 1
+            else:
+                os.replace(tmp_path, path)
+                self.written += 1
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+# shared by everything rendering in this process
+default_writer = OutputWriter()
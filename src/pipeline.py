@@ -0,0 +1,232 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from build import PageError, RenderSettings
+from convert import generate_page, render_page
+from content_cache import ContentCache
+from memory import MemoryBudget
+from output import OutputWriter
+from profiling import BuildSummary, PageProfile
+from template import load_template
+
+# pages read ahead of (and rendered ahead of being written by) default, per
+# I/O worker
+QUEUE_PER_WORKER = 4
+
+
+# Queue depths sampled every time the render stage takes a page, plus how
+# long it sat waiting on either side. A render stage that waits on reads
+# wants more I/O workers; one that waits on writes wants faster storage or
+# more writers; one that never waits is CPU bound (see -j).
+class PipelineStats:
+    def __init__(self):
+        self.samples = 0
+        self.read_depth = 0
+        self.read_depth_max = 0
+        self.write_depth = 0
+        self.write_depth_max = 0
+        self.read_wait = 0.0
+        self.write_wait = 0.0
+
+    def sample(self, read_depth: int, write_depth: int):
+        self.samples += 1
+        self.read_depth += read_depth
+        self.read_depth_max = max(self.read_depth_max, read_depth)
+        self.write_depth += write_depth
+        self.write_depth_max = max(self.write_depth_max, write_depth)
+
+    def summary(self) -> str:
+        n = max(self.samples, 1)
+        return (f"Pipeline: read queue {self.read_depth / n:.1f} avg / {self.read_depth_max} max, "
+                f"write queue {self.write_depth / n:.1f} avg / {self.write_depth_max} max; "
+                f"render waited {self.read_wait * 1000:.0f} ms on reads, {self.write_wait * 1000:.0f} ms on writes")
+
+
+# Runs in a reader thread. None in place of the text marks a page too big to
+# read whole, which generate_page then streams.
+def _read(page: tuple[str, str], profile: PageProfile, stream_threshold: int) -> str|None:
+    with profile.stage("read"):
+        with open(page[0]) as f:
+            profile.bytes_in = os.fstat(f.fileno()).st_size
+            if profile.bytes_in > stream_threshold:
+                return None
+            return f.read()
+
+
+def _render(settings: RenderSettings, profile: PageProfile, text: str) -> bytes:
+    template = load_template(settings.template, settings.basepath, settings.assets, settings.minify)
+    content_cache = ContentCache(settings.content_cache) if settings.content_cache else None
+    return render_page(text, template, False, profile, settings.minify, content_cache)
+
+
+# top-level so it can be pickled over to pool workers
+def _render_job(settings: RenderSettings, profile: PageProfile, text: str) -> tuple[bytes, PageProfile]:
+    settings.apply()
+    try:
+        return _render(settings, profile, text), profile
+    except Exception as e:
+        raise PageError(profile.source, f"{type(e).__name__}: {e}") from e
+
+
+# queue.get that gives up (returning None) once stop is set
+def _get_unless(q: queue.Queue, stop: threading.Event):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return None
+
+
+################################################################################
+# Builds pages as three overlapping stages joined by bounded queues, for
+# filesystems where opening, reading and writing a file is slow compared to
+# rendering it (network mounts in CI):
+#
+#   readers (io threads) -> render (this process, or -j pool workers)
+#                        -> writers (io threads)
+#
+# Reads run ahead of the render stage by at most queue_size pages and
+# rendered pages wait for a writer in a queue of the same size, so memory
+# stays bounded however many pages there are. Pages are rendered in walk
+# order, so the first failing page (in walk order) is the one reported.
+#
+# pages may be any iterable, consumed as it is read ahead. Given a summary,
+# profiles are added to it instead of being collected, and it is returned.
+# With a single writer thread (writers=1), pages are written in walk order,
+# which an archive (see archive.ArchiveWriter) needs to come out the same
+# every time.
+#
+# profiles = run_pipeline(pages, settings, io=8)
+################################################################################
+def run_pipeline(pages, settings: RenderSettings, io: int, jobs: int = 1, queue_size: int|None = None,
+                 writer: OutputWriter|None = None, summary: BuildSummary|None = None,
+                 writers: int|None = None) -> list[PageProfile]|BuildSummary:
+    settings.apply()
+    stream_threshold = settings.stream_threshold()
+    budget = MemoryBudget(settings.memory_budget) if settings.memory_budget else None
+    queue_size = queue_size or io * QUEUE_PER_WORKER
+    writer = writer or OutputWriter()
+    stats = PipelineStats()
+    read_queue = queue.Queue(queue_size)
+    write_queue = queue.Queue(queue_size)
+    stop = threading.Event()
+    # (walk index, exception) for pages that failed in a writer thread, or for
+    # the walk itself failing before it got to that index
+    failures = []
+    profiles = []
+    # walk index of every page's dest, to put profiles back in walk order
+    order = {} if summary is None else None
+    collect = summary.add if summary is not None else profiles.append
+
+    # gives up once the render stage has stopped taking pages
+    def put_read(item) -> bool:
+        while not stop.is_set():
+            try:
+                read_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def feed(readers: ThreadPoolExecutor):
+        index = 0
+        try:
+            for page in pages:
+                profile = PageProfile(page[0], page[1], settings.profile)
+                if not put_read((index, page, profile, readers.submit(_read, page, profile, stream_threshold))):
+                    return
+                if order is not None:
+                    order[page[1]] = index
+                index += 1
+        except Exception as e:
+            # pages is walked here, so a source it cannot hash (say) fails in
+            # this thread: handed to the main thread, which would otherwise
+            # wait on the read queue for ever
+            failures.append((index, e))
+            stop.set()
+            return
+        put_read(None)
+
+    def write():
+        while True:
+            item = write_queue.get()
+            if item is None:
+                return
+            index, page, profile, rendered = item
+            try:
+                if isinstance(rendered, bytes):
+                    page_bytes = rendered
+                else:
+                    # rendered by a pool worker, which sends back its own profile
+                    page_bytes, profile = rendered.result()
+                with profile.stage("write"):
+                    profile.written = writer.write(page[1], page_bytes)
+                collect(profile)
+            except Exception as e:
+                failures.append((index, e))
+                stop.set()
+            finally:
+                write_queue.task_done()
+
+    def ready_reads() -> int:
+        with read_queue.mutex:
+            return sum(1 for item in read_queue.queue if item is not None and item[3].done())
+
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    readers = ThreadPoolExecutor(max_workers=io, thread_name_prefix="ssg-read")
+    feeder = threading.Thread(target=feed, args=(readers,), daemon=True)
+    writer_threads = [threading.Thread(target=write, daemon=True) for _ in range(writers or io)]
+    feeder.start()
+    for w in writer_threads:
+        w.start()
+    try:
+        while not stop.is_set():
+            stats.sample(ready_reads(), write_queue.qsize())
+            start = time.perf_counter()
+            item = _get_unless(read_queue, stop)
+            if item is None:
+                break
+            index, page, profile, read = item
+            try:
+                text = read.result()
+                stats.read_wait += time.perf_counter() - start
+                if text is None:
+                    if writers == 1:
+                        # the pages before it go first
+                        write_queue.join()
+                    # too big to hold: streamed, with its own I/O, right here
+                    generate_page(page[0], settings.template, page[1], False, settings.basepath, profile, writer,
+                                  settings.assets, settings.minify, stream_threshold=stream_threshold)
+                    collect(profile)
+                    continue
+                print(f"Generating page from {page[0]} to {page[1]} using {settings.template}")
+                if pool is not None:
+                    rendered = pool.submit(_render_job, settings, profile, text)
+                else:
+                    rendered = _render(settings, profile, text)
+            except Exception as e:
+                raise PageError(page[0], f"{type(e).__name__}: {e}") from e
+            start = time.perf_counter()
+            write_queue.put((index, page, profile, rendered))
+            stats.write_wait += time.perf_counter() - start
+            if budget is not None:
+                budget.tick()
+    finally:
+        stop.set()
+        for _ in writer_threads:
+            write_queue.put(None)
+        for w in writer_threads:
+            w.join()
+        feeder.join()
+        readers.shutdown(cancel_futures=True)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    if failures:
+        raise min(failures, key=lambda f: f[0])[1]
+    print(stats.summary())
+    if summary is not None:
+        return summary
+    return sorted(profiles, key=lambda p: order[p.dest])
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from build import CONTENT_PATH, STATIC_ASSETS_PATH, TEMPLATE_PATH
+from cache import LRUCache
+from convert import render_page
+from template import load_template
+
+# rendered pages held by default
+PAGE_CACHE_SIZE = 256
+
+
+# The markdown file a request path is rendered from: the inverse of how
+# main.walk_pages names outputs ("/blog/" and "/blog/index.html" come from
+# content/blog/index.md). None for paths outside the site or its content.
+def source_for(url_path: str, content: str = CONTENT_PATH, basepath: str = "/") -> str|None:
+    path = unquote(urlsplit(url_path).path)
+    if not path.startswith(basepath):
+        return None
+    rel = path[len(basepath):]
+    if rel == "" or rel.endswith("/"):
+        rel += "index.html"
+    if not rel.endswith(".html"):
+        return None
+    rel = os.path.normpath(rel[:-len(".html")] + ".md")
+    if rel.startswith("..") or os.path.isabs(rel):
+        return None
+    return os.path.join(content, rel)
+
+
+class CachedPage:
+    def __init__(self, stamp: tuple[int, int], source_hash: str, template, body: bytes):
+        # (mtime_ns, size) of the source when it was last checked
+        self.stamp = stamp
+        self.source_hash = source_hash
+        # the compiled Template it was rendered with, see template.load_template
+        self.template = template
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+
+
+################################################################################
+# Pages rendered on request, straight from their markdown, held in an LRU
+# cache. A cached page is served as long as its source's mtime and size are
+# unchanged (one stat per request) and the template has not been recompiled;
+# a source whose mtime moved but whose bytes hash the same is not re-rendered
+# either. Concurrent requests for the same missing page may both render it.
+#
+# pages = PageRenderer("template.html", "/")
+# page = pages.get("content/index.md")    # a CachedPage, or None if missing
+################################################################################
+class PageRenderer:
+    def __init__(self, template_path: str = TEMPLATE_PATH, basepath: str = "/", minify: bool = False,
+                 cache_size: int = PAGE_CACHE_SIZE):
+        self.template_path = template_path
+        self.basepath = basepath
+        self.minify = minify
+        self.cache = LRUCache(cache_size)
+        self.renders = 0
+        # render_page reads and sets module state (the inline cache, the
+        # attribute minifier) that is not safe to share between threads
+        self._render_lock = threading.Lock()
+
+    def get(self, source: str) -> CachedPage|None:
+        try:
+            st = os.stat(source)
+        except (FileNotFoundError, NotADirectoryError):
+            self.cache.pop(source)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        template = load_template(self.template_path, self.basepath, minify=self.minify)
+        page = self.cache.get(source)
+        if page is not None and page.stamp == stamp and page.template is template:
+            return page
+        with open(source, "rb") as f:
+            data = f.read()
+        source_hash = hashlib.sha256(data).hexdigest()
+        if page is not None and page.source_hash == source_hash and page.template is template:
+            # touched, not edited
+            page.stamp = stamp
+            return page
+        # newlines translated as the build's text-mode read does
+        text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        with self._render_lock:
+            body = render_page(text, template, minify=self.minify)
+            self.renders += 1
+        page = CachedPage(stamp, source_hash, template, body)
+        self.cache.put(source, page)
+        return page
+
+
+# Serves rendered pages from a PageRenderer and everything else from static/.
+class PreviewHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, pages: PageRenderer, content: str = CONTENT_PATH, **kwargs):
+        # must be set before the base __init__, which handles the request
+        self.pages = pages
+        self.content = content
+        super().__init__(*args, **kwargs)
+
+    def translate_path(self, path: str) -> str:
+        # static files are published at the site root, under the basepath
+        basepath = self.pages.basepath
+        if path.startswith(basepath):
+            path = "/" + path[len(basepath):]
+        return super().translate_path(path)
+
+    def do_GET(self):
+        self.send_page(head=False)
+
+    def do_HEAD(self):
+        self.send_page(head=True)
+
+    def send_page(self, head: bool):
+        source = source_for(self.path, self.content, self.pages.basepath)
+        try:
+            page = self.pages.get(source) if source is not None else None
+        except Exception as e:
+            self.send_error(500, f"{source}: {type(e).__name__}: {e}")
+            return
+        if page is None:
+            if head:
+                super().do_HEAD()
+            else:
+                super().do_GET()
+            return
+        if page.etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", page.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page.body)))
+        self.send_header("ETag", page.etag)
+        # always revalidated, which costs a 304 while the page is unchanged
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if not head:
+            self.wfile.write(page.body)
+
+
+def preview(args):
+    pages = PageRenderer(TEMPLATE_PATH, args.basepath, args.minify, args.page_cache)
+    handler = partial(PreviewHandler, directory=STATIC_ASSETS_PATH, pages=pages)
+    httpd = ThreadingHTTPServer(("", args.port), handler)
+    httpd.daemon_threads = True
+    print(f"Previewing {CONTENT_PATH}/ on http://localhost:{args.port}{args.basepath}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        print(f"Page cache: {pages.cache.stats()}, {pages.renders} renders")
@@ -0,0 +1,228 @@
+import csv
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# "stream" stands in for all of them on pages big enough to be streamed, and
+# "content_cache" replaces blocks, inline and render on pages found in it (and
+# template too, for pages found in it whole)
+STAGES = ["read", "content_cache", "blocks", "inline", "render", "template", "write", "stream"]
+
+_NULL_STAGE = nullcontext()
+
+
+################################################################################
+# Timings and sizes for one generated page. generate_page wraps each of its
+# stages in profile.stage(name); a disabled profile makes that a no-op, so
+# unprofiled builds pay nothing for it.
+#
+# profile = PageProfile("content/index.md", "docs/index.html")
+# with profile.stage("read"):
+#     ...
+# profile.total()
+################################################################################
+class PageProfile:
+    def __init__(self, source: str, dest: str, enabled: bool = True):
+        self.source = source
+        self.dest = dest
+        self.enabled = enabled
+        self.stages = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.nodes = 0
+        # False when the output already held exactly these bytes
+        self.written = True
+        # inline cache lookups made while rendering this page
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # taken off the page by --minify
+        self.bytes_saved = 0
+        # True when the content HTML came from the content cache
+        self.content_cached = False
+        # True when the whole page did
+        self.page_cached = False
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "dest": self.dest,
+            "total_s": round(self.total(), 6),
+            "stages": {name: round(t, 6) for name, t in self.stages.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "nodes": self.nodes,
+            "written": self.written,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "bytes_saved": self.bytes_saved,
+            "content_cached": self.content_cached,
+            "page_cached": self.page_cached,
+        }
+
+
+def count_nodes(node) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        count += 1
+        if n.children:
+            stack.extend(n.children)
+    return count
+
+
+################################################################################
+# Running totals over a build's page profiles, so summaries and reports can be
+# produced without keeping every profile. keep bounds how many of the slowest
+# profiles (and of the pages minifying saved most on) are held on to; None
+# keeps them all.
+#
+# summary = BuildSummary(keep=1000)
+# for profile in profiles:
+#     summary.add(profile)
+# print_build_summary(summary)
+################################################################################
+class BuildSummary:
+    def __init__(self, keep: int|None = None):
+        self.keep = keep
+        self.pages = 0
+        self.written = 0
+        self.total_s = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.nodes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_saved = 0
+        self.minified = 0
+        self.content_cached = 0
+        self.page_cached = 0
+        # (total, n, profile) and (bytes_saved, n, dest) heaps, n breaking ties
+        self._slowest = []
+        self._most_saved = []
+        # pages are added from pipeline writer threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, profiles) -> "BuildSummary":
+        if isinstance(profiles, cls):
+            return profiles
+        summary = cls()
+        for p in profiles:
+            summary.add(p)
+        return summary
+
+    def add(self, p: PageProfile):
+        total = p.total()
+        with self._lock:
+            self.pages += 1
+            self.written += p.written
+            self.total_s += total
+            for name, t in p.stages.items():
+                self.stages[name] = self.stages.get(name, 0.0) + t
+            self.bytes_in += p.bytes_in
+            self.bytes_out += p.bytes_out
+            self.nodes += p.nodes
+            self.cache_hits += p.cache_hits
+            self.cache_misses += p.cache_misses
+            self.content_cached += p.content_cached
+            self.page_cached += p.page_cached
+            if p.bytes_saved:
+                self.bytes_saved += p.bytes_saved
+                self.minified += 1
+                self._push(self._most_saved, (p.bytes_saved, self.pages, p.dest), 10 if self.keep is not None else None)
+            self._push(self._slowest, (total, self.pages, p), self.keep)
+
+    @staticmethod
+    def _push(heap: list, item: tuple, limit: int|None):
+        if limit is None or len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def slowest(self) -> list[PageProfile]:
+        return [p for _, _, p in sorted(self._slowest, key=lambda item: (-item[0], item[1]))]
+
+    def most_saved(self) -> list[tuple[int, str]]:
+        return [(saved, dest) for saved, _, dest in sorted(self._most_saved, key=lambda item: (-item[0], item[1]))]
+
+
+# Writes every page's profile (or the slowest a BuildSummary kept), slowest
+# first, as CSV if path ends in .csv and JSON (with per-stage totals for the
+# whole build) otherwise.
+def write_report(profiles: list[PageProfile]|BuildSummary, path: str):
+    summary = BuildSummary.of(profiles)
+    pages = summary.slowest()
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["source", "dest", "total_s"] + STAGES + ["bytes_in", "bytes_out", "nodes", "bytes_saved"])
+            for p in pages:
+                writer.writerow([p.source, p.dest, f"{p.total():.6f}"]
+                                + [f"{p.stages.get(s, 0.0):.6f}" for s in STAGES]
+                                + [p.bytes_in, p.bytes_out, p.nodes, p.bytes_saved])
+        return
+    report = {
+        "pages": summary.pages,
+        "total_s": round(summary.total_s, 6),
+        "stages": {s: round(summary.stages.get(s, 0.0), 6) for s in STAGES},
+        "bytes_in": summary.bytes_in,
+        "bytes_out": summary.bytes_out,
+        "nodes": summary.nodes,
+        "cache_hits": summary.cache_hits,
+        "cache_misses": summary.cache_misses,
+        "bytes_saved": summary.bytes_saved,
+        "content_cached": summary.content_cached,
+        "page_cached": summary.page_cached,
+        "slowest": [p.to_dict() for p in pages],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
+
+
+def print_summary(profiles: list[PageProfile]|BuildSummary, top: int = 10):
+    summary = BuildSummary.of(profiles)
+    pages = summary.slowest()
+    print(f"Slowest {min(top, len(pages))} of {summary.pages} pages:")
+    for p in pages[:top]:
+        worst = max(p.stages, key=p.stages.get) if p.stages else "-"
+        print(f"  {p.total() * 1000:8.2f} ms  {p.source} ({worst}, {p.bytes_in} B in, {p.bytes_out} B out, {p.nodes} nodes)")
+
+
+# With page_cache (the build used the content cache), the page cache line is
+# printed even when no page was reused.
+def print_build_summary(profiles: list[PageProfile]|BuildSummary, page_cache: bool = False):
+    summary = BuildSummary.of(profiles)
+    print(f"Pages: {summary.written} written, {summary.pages - summary.written} unchanged")
+    hits, misses = summary.cache_hits, summary.cache_misses
+    if hits + misses:
+        print(f"Inline cache: {hits} hits, {misses} misses ({hits / (hits + misses):.1%} hit rate)")
+    if summary.page_cached or page_cache:
+        rate = summary.page_cached / summary.pages if summary.pages else 0
+        print(f"Page cache: {summary.page_cached} of {summary.pages} pages reused ({rate:.1%} hit rate)")
+    if summary.content_cached:
+        print(f"Content cache: {summary.content_cached} of {summary.pages} pages not re-parsed")
+    if summary.minified:
+        print("Minified:")
+        for saved, dest in summary.most_saved()[:10]:
+            print(f"  {saved:8d} B  {dest}")
+        print(f"  {summary.bytes_saved} B saved over {summary.minified} pages ({summary.bytes_saved // summary.minified} B per page)")
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from assets import ASSET_MANIFEST_PATH, HASH_CACHE_PATH, HashCache, PUBLISHED_ASSET_MAP, fingerprint_assets, sync_dir
+from build import CONTENT_PATH, STATIC_ASSETS_PATH, TEMPLATE_PATH, WEB_PATH, RenderSettings
+from compress import COMPRESS_CACHE_PATH, compress_outputs
+from content_cache import CONTENT_CACHE_PATH, ContentCache
+from convert import generate_page, use_images
+from images import IMAGE_CACHE_PATH, measure_images
+from manifest import CACHE_PATH
+from output import default_writer
+from template import load_template
+from main import generate_page_recursive, page_filename
+
+RELOAD_PATH = "/__reload"
+RELOAD_SCRIPT = f'<script>new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();</script>'.encode()
+
+
+# Adds the live-reload client to a served page (never to the built files).
+def inject_reload_script(html: bytes) -> bytes:
+    index = html.rfind(b"</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT
+    return html[:index] + RELOAD_SCRIPT + html[index:]
+
+
+def _snapshot(paths: list[str]) -> dict[str, tuple[int, int]]:
+    stamps = {}
+    for root in paths:
+        if os.path.isfile(root):
+            st = os.stat(root)
+            stamps[root] = (st.st_mtime_ns, st.st_size)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                stamps[path] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+
+################################################################################
+# Polls content/, static/ and the template (with its partials) for changes and
+# redoes only the work each change needs: a changed page is re-rendered on its
+# own, static/ is re-synced (a stat per unchanged file), and only a template
+# change re-renders every page. With --fingerprint or --lazy-images, a static
+# change that renames an asset or resizes an image re-renders every page too,
+# since any of them may link to it. Its caches go under cache_dir.
+#
+# watcher = Watcher(args)
+# changed, removed = watcher.poll()
+# watcher.rebuild(changed, removed)
+################################################################################
+class Watcher:
+    def __init__(self, args, content: str = CONTENT_PATH, static: str = STATIC_ASSETS_PATH,
+                 template: str = TEMPLATE_PATH, publish: str = WEB_PATH, cache_dir: str = CACHE_PATH):
+        self.args = args
+        self.content = content
+        self.static = static
+        self.template = template
+        self.publish = publish
+        self.cache_dir = cache_dir
+        self.hashes = HashCache(self.cache_path(HASH_CACHE_PATH))
+        self.content_cache = ContentCache(self.cache_path(CONTENT_CACHE_PATH)) if getattr(args, "content_cache", False) else None
+        self.assets, self.images = self.scan_static()
+        use_images(self.images)
+        self.stamps = _snapshot(self.watched_paths())
+
+    # where one of the build's cache files lives under cache_dir
+    def cache_path(self, default: str) -> str:
+        return os.path.join(self.cache_dir, os.path.relpath(default, CACHE_PATH))
+
+    # the asset map and image sizes pages are rendered with, as in main.build
+    def scan_static(self):
+        assets = images = None
+        if getattr(self.args, "fingerprint", False):
+            assets = fingerprint_assets(self.static, self.hashes)
+        if getattr(self.args, "lazy_images", False):
+            images = measure_images(self.static, self.hashes, self.cache_path(IMAGE_CACHE_PATH))
+        self.hashes.save()
+        return assets, images
+
+    def watched_paths(self) -> list[str]:
+        try:
+            template_files = load_template(self.template, self.args.basepath).dependencies
+        except Exception:
+            # missing or mid-edit template, keep watching the file itself
+            template_files = [self.template]
+        return [self.content, self.static] + template_files
+
+    def poll(self) -> tuple[set[str], set[str]]:
+        stamps = _snapshot(self.watched_paths())
+        changed = {p for p, stamp in stamps.items() if self.stamps.get(p) != stamp}
+        removed = set(self.stamps) - set(stamps)
+        self.stamps = stamps
+        return changed, removed
+
+    def _under(self, path: str, root: str) -> bool:
+        return os.path.commonpath([os.path.abspath(path), os.path.abspath(root)]) == os.path.abspath(root)
+
+    def page_dest(self, from_path: str) -> str:
+        rel = os.path.relpath(from_path, self.content)
+        return os.path.join(self.publish, os.path.dirname(rel), page_filename(os.path.basename(rel)))
+
+    # Returns the number of outputs touched.
+    def rebuild(self, changed: set[str], removed: set[str]) -> int:
+        paths = changed | removed
+        touched = 0
+        rerender = any(not self._under(p, self.content) and not self._under(p, self.static) for p in paths)
+        if any(self._under(p, self.static) for p in paths):
+            assets, images = self.scan_static()
+            if assets != self.assets:
+                self.assets = assets
+                default_writer.write(os.path.join(self.publish, PUBLISHED_ASSET_MAP), assets.to_json())
+                rerender = True
+            if images != self.images:
+                self.images = images
+                use_images(images)
+                rerender = True
+            stats = sync_dir(self.static, self.publish, self.cache_path(ASSET_MANIFEST_PATH), link=self.args.link_assets,
+                             checksum=self.args.checksum, assets=self.assets)
+            touched += stats["copied"] + stats["removed"]
+        if rerender:
+            jobs = self.args.jobs if self.args.jobs > 0 else (os.cpu_count() or 1)
+            settings = RenderSettings(self.template, self.args.basepath, assets=self.assets, images=self.images,
+                                      minify=getattr(self.args, "minify", False),
+                                      content_cache=self.content_cache.root if self.content_cache else None)
+            generate_page_recursive(self.content, self.template, self.publish, self.args.basepath, jobs=jobs, settings=settings)
+            return touched + len(paths)
+
+        for path in sorted(p for p in changed if self._under(p, self.content)):
+            generate_page(path, self.template, self.page_dest(path), False, self.args.basepath, assets=self.assets,
+                          minify=getattr(self.args, "minify", False), content_cache=self.content_cache)
+            touched += 1
+        for path in sorted(p for p in removed if self._under(p, self.content)):
+            dest = self.page_dest(path)
+            if os.path.exists(dest):
+                print(f"Removing {dest}")
+                os.remove(dest)
+                touched += 1
+        return touched
+
+    def run(self, on_change, interval: float = 0.2):
+        while True:
+            time.sleep(interval)
+            changed, removed = self.poll()
+            if not changed and not removed:
+                continue
+            start = time.perf_counter()
+            try:
+                touched = self.rebuild(changed, removed)
+                if getattr(self.args, "compress", None):
+                    compress_outputs(self.publish, self.args.compress, self.args.compress_level, hashes=self.hashes,
+                                     cache_path=self.cache_path(COMPRESS_CACHE_PATH))
+            except Exception as e:
+                print(f"Rebuild failed: {e}")
+                continue
+            print(f"Rebuilt {touched} output(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+            on_change()
+
+
+# Lets any number of waiting SSE connections know a rebuild has finished.
+class ReloadBroadcaster:
+    def __init__(self):
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, seen: int, timeout: float) -> int:
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != seen, timeout)
+            return self.generation
+
+
+class DevHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, broadcaster: ReloadBroadcaster|None = None, **kwargs):
+        # must be set before the base __init__, which handles the request
+        self.broadcaster = broadcaster
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH and self.broadcaster is not None:
+            self.stream_reloads()
+            return
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+            path = os.path.join(path, "index.html")
+        if self.broadcaster is None or not path.endswith(".html") or not os.path.isfile(path):
+            super().do_GET()
+            return
+        with open(path, "rb") as f:
+            body = inject_reload_script(f.read())
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        seen = self.broadcaster.generation
+        try:
+            while True:
+                generation = self.broadcaster.wait(seen, 15)
+                if generation == seen:
+                    # keeps idle connections from being dropped
+                    self.wfile.write(b": ping\n\n")
+                else:
+                    self.wfile.write(b"data: reload\n\n")
+                    seen = generation
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def serve(args):
+    broadcaster = ReloadBroadcaster() if args.watch else None
+    handler = partial(DevHandler, directory=WEB_PATH, broadcaster=broadcaster)
+    httpd = ThreadingHTTPServer(("", args.port), handler)
+    httpd.daemon_threads = True
+    if args.watch:
+        watcher = Watcher(args)
+        threading.Thread(target=watcher.run, args=(broadcaster.notify,), daemon=True).start()
+        print(f"Watching {CONTENT_PATH}/, {STATIC_ASSETS_PATH}/ and {TEMPLATE_PATH}")
+    print(f"Serving {WEB_PATH}/ on http://localhost:{args.port}/")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,132 @@
+import argparse
+import hashlib
+import json
+import os
+from shutil import rmtree
+from manifest import Manifest
+from output import OutputWriter, default_writer
+
+SHARDS_PATH = "shards"
+# written into every shard's output directory, listing what it rendered
+SHARD_MANIFEST = "shard.json"
+# how many paths of each kind a MergeError lists
+MERGE_ERRORS_LISTED = 10
+
+
+class MergeError(Exception):
+    pass
+
+
+# argparse type for --shard: "2/4" is the second of four shards
+def parse_shard(spec: str) -> tuple[int, int]:
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {spec!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} of {count} does not exist (shards count from 1)")
+    return index, count
+
+
+# The shard (1 to count) a page belongs to, from a hash of its path relative to
+# content/, so every builder agrees on the split without talking to the others
+# and a page stays in its shard when pages are added or removed.
+def shard_of(rel_path: str, count: int) -> int:
+    digest = hashlib.sha256(rel_path.replace(os.sep, "/").encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def shard_dir(index: int, count: int, root: str = SHARDS_PATH) -> str:
+    return os.path.join(root, f"{index}-of-{count}")
+
+
+# Records what a shard build rendered (and with which inputs) for merge_shards.
+def write_shard_manifest(publish: str, content: str, shard: tuple[int, int], manifest: Manifest):
+    pages = {os.path.relpath(dest, publish): [os.path.relpath(source, content), key]
+             for dest, source, key in manifest.records()}
+    data = {"shard": shard[0], "of": shard[1], "basepath": manifest.basepath, "inputs": manifest.template_hash,
+            "pages": pages}
+    default_writer.write(os.path.join(publish, SHARD_MANIFEST), json.dumps(data, indent=1, sort_keys=True))
+
+
+def read_shards(root: str = SHARDS_PATH) -> list[dict]:
+    shards = []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        path = os.path.join(root, name, SHARD_MANIFEST)
+        if os.path.isfile(path):
+            with open(path) as f:
+                shard = json.load(f)
+            shard["dir"] = os.path.join(root, name)
+            shards.append(shard)
+    return shards
+
+
+def _listed(kind: str, paths: list[str]) -> str:
+    shown = ", ".join(paths[:MERGE_ERRORS_LISTED])
+    more = f" and {len(paths) - MERGE_ERRORS_LISTED} more" if len(paths) > MERGE_ERRORS_LISTED else ""
+    return f"{len(paths)} {kind}: {shown}{more}"
+
+
+################################################################################
+# Combines the outputs of a complete set of shard builds (see --shard) into
+# publish. Checked first, against the content walk (pages, as (source, dest)
+# pairs) and the manifest of this merge:
+#
+# - every shard from 1 to N is there, once, all from the same N
+# - all of them were built with this template, basepath and flags
+# - every page is in exactly one shard, and none is missing or unknown
+# - every page was rendered from its current source
+#
+# Anything wrong raises a MergeError naming it, before publish is touched.
+# Otherwise publish is emptied first if clean, then the pages are written
+# through writer (so unchanged ones keep their mtime) and recorded in
+# manifest. Returns how many were written.
+#
+# merge_shards(read_shards(), pages, "docs", "content", manifest)
+################################################################################
+def merge_shards(shards: list[dict], pages, publish: str, content: str, manifest: Manifest,
+                 writer: OutputWriter = default_writer, clean: bool = False) -> int:
+    if not shards:
+        raise MergeError("no shard outputs to merge")
+    problems = []
+    count = shards[0]["of"]
+    if any(s["of"] != count for s in shards):
+        problems.append("shards of different splits: " + ", ".join(sorted({s["dir"] for s in shards})))
+    indexes = [s["shard"] for s in shards]
+    absent = [str(i) for i in range(1, count + 1) if i not in indexes]
+    if absent:
+        problems.append(f"shards {', '.join(absent)} of {count} missing")
+    for s in shards:
+        if s["inputs"] != manifest.template_hash or s["basepath"] != manifest.basepath:
+            problems.append(f"{s['dir']} was built with a different template, basepath or flags")
+
+    owner = {}
+    overlaps = []
+    for s in shards:
+        for dest in s["pages"]:
+            if dest in owner:
+                overlaps.append(f"{dest} ({owner[dest]['dir']}, {s['dir']})")
+            else:
+                owner[dest] = s
+    expected = {os.path.relpath(dest, publish): source for source, dest in pages}
+    missing = sorted(set(expected) - set(owner))
+    unknown = sorted(set(owner) - set(expected))
+    outdated = [dest for dest, source in expected.items()
+                if dest in owner and owner[dest]["pages"][dest][1] != manifest.page_key(source)]
+    for kind, paths in [("pages in more than one shard", overlaps), ("pages missing", missing),
+                        ("pages with no source", unknown), ("pages rendered from an older source", sorted(outdated))]:
+        if paths:
+            problems.append(_listed(kind, paths))
+    if problems:
+        raise MergeError("cannot merge shards:\n  " + "\n  ".join(problems))
+    if clean and os.path.exists(publish):
+        print(f"Clearing {publish}")
+        rmtree(publish)
+
+    written = 0
+    for dest in sorted(owner):
+        source, key = owner[dest]["pages"][dest]
+        with open(os.path.join(owner[dest]["dir"], dest), "rb") as f:
+            written += writer.write(os.path.join(publish, dest), f.read())
+        manifest.record(os.path.join(content, source), os.path.join(publish, dest), key)
+    return written
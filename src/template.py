@@ -0,0 +1,189 @@
+import hashlib
+import os
+import re
+from htmlnode import writer_fn
+from minify import minify_segments
+
+# {{ Name }} is a placeholder, {{> path/to/partial.html }} includes another
+# template file (relative to the including template's directory)
+_TOKEN = re.compile(r"\{\{\s*(>)?\s*([^\s{}]+)\s*\}\}")
+# values may be unquoted in minified output
+_ROOTED = re.compile(r'(href|src)=("?)/')
+# the closing quote is optional: streamed fragments can end mid-attribute
+_ROOTED_URL = re.compile(r'(href|src)=("?)/([^"?#\s>]*)')
+
+
+# Points root-relative href/src attributes at the site's basepath, and, given
+# an asset map (see assets.AssetMap), at the fingerprinted name of each asset.
+def rewrite_rooted(html: str, basepath: str, assets=None) -> str:
+    if not assets:
+        if basepath == "/":
+            return html
+        return _ROOTED.sub(lambda m: f'{m.group(1)}={m.group(2)}{basepath}', html)
+
+    def replace(m):
+        url = "/" + m.group(3)
+        return f'{m.group(1)}={m.group(2)}{basepath}{assets.get(url, url)[1:]}'
+    return _ROOTED_URL.sub(replace, html)
+
+
+# Splits template text into literals and Slots, inlining partials recursively.
+def _parse(text: str, base_dir: str, including: tuple) -> tuple[list, list[str]]:
+    segments = []
+    dependencies = []
+    pos = 0
+    for m in _TOKEN.finditer(text):
+        if m.start() > pos:
+            segments.append(text[pos:m.start()])
+        pos = m.end()
+        if not m.group(1):
+            segments.append(Slot(m.group(2), m.group()))
+            continue
+        partial_path = os.path.normpath(os.path.join(base_dir, m.group(2)))
+        if partial_path in including:
+            raise Exception(f"Template include cycle: {' -> '.join(including + (partial_path,))}")
+        with open(partial_path) as f:
+            partial_segments, partial_dependencies = _parse(f.read(), os.path.dirname(partial_path), including + (partial_path,))
+        segments.extend(partial_segments)
+        dependencies.append(partial_path)
+        dependencies.extend(partial_dependencies)
+    if pos < len(text):
+        segments.append(text[pos:])
+    return segments, dependencies
+
+
+class Slot:
+    def __init__(self, name: str, raw: str):
+        self.name = name
+        # unfilled placeholders are written back out untouched
+        self.raw = raw
+
+    def __eq__(self, other):
+        return isinstance(other, Slot) and self.name == other.name
+
+    def __repr__(self):
+        return f"Slot({self.name})"
+
+
+################################################################################
+# A template compiled into a flat list of literal strings and Slots. Partials
+# are inlined and the basepath rewrite is applied to the literals once, at
+# compile time, so rendering a page is a single concatenation. With
+# minify=True the literals are minified then too (see minify.minify_segments).
+#
+# template = Template.compile('<title>{{ Title }}</title>{{ Content }}', "/")
+# template.render({"Title": "Home", "Content": "<p>hi</p>"})
+################################################################################
+class Template:
+    def __init__(self, segments: list[str|Slot], basepath: str, dependencies: list[str]|None = None, assets=None, saved: int = 0):
+        self.segments = segments
+        self.basepath = basepath
+        self.assets = assets
+        # bytes minifying took off the literals, i.e. off every page
+        self.saved = saved
+        # every file the compiled template was built from, for cache checks
+        self.dependencies = dependencies or []
+        self._digest = None
+
+    # Identifies what the template writes around a page's values, whatever
+    # files it was compiled from: two templates with the same digest render
+    # the same values to the same bytes.
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            h = hashlib.sha256()
+            h.update(f"{self.basepath}\0{self.assets.key if self.assets else ''}\0".encode())
+            for segment in self.segments:
+                if isinstance(segment, str):
+                    h.update(b"L" + segment.encode() + b"\0")
+                else:
+                    h.update(b"S" + segment.raw.encode() + b"\0")
+            self._digest = h.hexdigest()
+        return self._digest
+
+    @classmethod
+    def compile(cls, text: str, basepath: str = "/", base_dir: str = ".", _including: tuple = (), assets=None, minify: bool = False):
+        segments, dependencies = _parse(text, base_dir, _including)
+        # merge neighbouring literals (left behind by partials) and rewrite them
+        merged = []
+        for segment in segments:
+            if isinstance(segment, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += segment
+            else:
+                merged.append(segment)
+        merged = [rewrite_rooted(s, basepath, assets) if isinstance(s, str) else s for s in merged]
+        saved = 0
+        if minify:
+            literal_bytes = sum(len(s) for s in merged if isinstance(s, str))
+            merged = [s for s in minify_segments(merged) if s != ""]
+            saved = literal_bytes - sum(len(s) for s in merged if isinstance(s, str))
+        return cls(merged, basepath, dependencies, assets, saved)
+
+    @classmethod
+    def load(cls, path: str, basepath: str = "/", assets=None, minify: bool = False):
+        with open(path) as f:
+            template = cls.compile(f.read(), basepath, os.path.dirname(path), (os.path.normpath(path),), assets, minify)
+        template.dependencies.insert(0, path)
+        return template
+
+    def slots(self) -> list[str]:
+        return [s.name for s in self.segments if isinstance(s, Slot)]
+
+    def render(self, values: dict) -> str:
+        parts = []
+        self.render_to(parts, values)
+        return "".join(parts)
+
+    # Streams the page into writer (see HTMLNode.render_to). Values are
+    # strings or anything with a render_to, such as a ParentNode, which is
+    # then rendered fragment by fragment straight into the writer.
+    def render_to(self, writer, values: dict):
+        write = writer_fn(writer)
+        if self.basepath == "/" and not self.assets:
+            write_value = write
+        else:
+            write_value = lambda fragment: write(rewrite_rooted(fragment, self.basepath, self.assets))
+        for segment in self.segments:
+            if isinstance(segment, str):
+                write(segment)
+                continue
+            value = values.get(segment.name)
+            if value is None:
+                write(segment.raw)
+            elif isinstance(value, str):
+                write_value(value)
+            else:
+                value.render_to(write_value)
+
+
+def _stamp(paths: list[str]):
+    stamp = []
+    for path in paths:
+        st = os.stat(path)
+        stamp.append((st.st_mtime_ns, st.st_size))
+    return tuple(stamp)
+
+
+# (path, basepath, asset map key, minify) -> (stamp of every dependency, Template)
+_cache = {}
+
+
+# Compiles a template file once and hands back the same Template until the
+# file (or one of its partials) changes on disk.
+def load_template(path: str, basepath: str = "/", assets=None, minify: bool = False) -> Template:
+    key = (os.path.abspath(path), basepath, assets.key if assets else None, minify)
+    cached = _cache.get(key)
+    if cached is not None:
+        stamp, template = cached
+        try:
+            if _stamp(template.dependencies) == stamp:
+                return template
+        except FileNotFoundError:
+            pass
+    template = Template.load(path, basepath, assets, minify)
+    _cache[key] = (_stamp(template.dependencies), template)
+    return template
+
+
+def clear_template_cache():
+    _cache.clear()
@@ -0,0 +1,99 @@
+import gzip
+import os
+import tarfile
+import unittest
+import zipfile
+
+import convert
+from archive import ArchiveWriter, is_archive
+from fixtures import SiteTestCase
+from main import RenderSettings, generate_page_recursive, walk_pages
+
+
+class TestArchiveWriter(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = self.write("index.css", "body { margin: 0; }\n" * 20)
+
+    def make(self, name, codecs=None):
+        path = os.path.join(self.dir, name)
+        with ArchiveWriter(path, "docs", codecs) as archive:
+            archive.add_file("docs/index.css", self.static)
+            archive.write("docs/blog/index.html", "<p>" + "blog " * 50 + "</p>")
+            with archive.open_text("docs/big.html") as f:
+                f.write("<p>big</p>")
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_is_archive(self):
+        self.assertTrue(is_archive("site.tar.gz"))
+        self.assertTrue(is_archive("site.zip"))
+        self.assertFalse(is_archive("docs"))
+
+    def test_tar(self):
+        data = self.make("site.tar.gz", ["gzip"])
+        self.assertEqual(data, self.make("again.tar.gz", ["gzip"]))
+        with tarfile.open(os.path.join(self.dir, "site.tar.gz")) as tar:
+            self.assertEqual(tar.getnames(), ["index.css", "index.css.gz", "blog/index.html", "blog/index.html.gz", "big.html"])
+            self.assertEqual({m.mtime for m in tar}, {0})
+            self.assertEqual(tar.extractfile("big.html").read(), b"<p>big</p>")
+            css = tar.extractfile("index.css").read()
+            self.assertEqual(gzip.decompress(tar.extractfile("index.css.gz").read()), css)
+
+    def test_streamed_page_compressed_in_chunks(self):
+        path = os.path.join(self.dir, "site.tar")
+        page = "".join(f"<p>paragraph {i}</p>\n" for i in range(20000))
+        with ArchiveWriter(path, "docs", ["gzip"]) as archive:
+            with archive.open_text("docs/big.html") as f:
+                f.write(page)
+        with tarfile.open(path) as tar:
+            self.assertEqual(tar.getnames(), ["big.html", "big.html.gz"])
+            self.assertEqual(tar.extractfile("big.html.gz").read(), gzip.compress(page.encode(), 9, mtime=0))
+
+    def test_zip(self):
+        data = self.make("site.zip")
+        self.assertEqual(data, self.make("again.zip"))
+        with zipfile.ZipFile(os.path.join(self.dir, "site.zip")) as z:
+            self.assertEqual(z.namelist(), ["index.css", "blog/index.html", "big.html"])
+            self.assertEqual(z.read("big.html"), b"<p>big</p>")
+
+    def test_failed_build_leaves_no_archive(self):
+        path = os.path.join(self.dir, "site.tar")
+        with self.assertRaises(RuntimeError):
+            with ArchiveWriter(path, "docs") as archive:
+                archive.write("docs/index.html", "<p></p>")
+                raise RuntimeError("render failed")
+        self.assertEqual(sorted(os.listdir(self.dir)), ["index.css", "template.html"])
+
+
+class TestArchiveBuild(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_pages(["b", "a", "c/e", "f"])
+        self.add_pages(["c/d"], "Some **bold** text in {name}. " * 200)
+
+    def test_pages_in_walk_order(self):
+        publish = os.path.join(self.dir, "docs")
+        expected = [os.path.relpath(dest, publish) for _, dest in walk_pages(self.content, publish, make_dirs=False)]
+        archives = []
+        threshold = convert.STREAM_THRESHOLD
+        # c/d is streamed, between pages written by the pipeline's writer
+        convert.STREAM_THRESHOLD = 1000
+        try:
+            for jobs in (1, 2):
+                path = os.path.join(self.dir, f"site-{jobs}.tar")
+                with ArchiveWriter(path, publish) as archive:
+                    generate_page_recursive(self.content, self.template, publish, "/", jobs=jobs,
+                                            settings=RenderSettings(self.template, "/", io=3), writer=archive)
+                with tarfile.open(path) as tar:
+                    self.assertEqual(tar.getnames(), expected)
+                with open(path, "rb") as f:
+                    archives.append(f.read())
+        finally:
+            convert.STREAM_THRESHOLD = threshold
+        self.assertEqual(archives[0], archives[1])
+        self.assertFalse(os.path.exists(publish))
+
+
+if __name__ == "__main__":
+    unittest.main()
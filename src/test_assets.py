@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import assets
+from assets import AssetMap, HashCache, fingerprint_assets, fingerprinted_name, sync_dir
+from manifest import file_hash
+
+
+class TestSyncDir(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.source = os.path.join(self.dir, "static")
+        self.dest = os.path.join(self.dir, "docs")
+        self.manifest = os.path.join(self.dir, "cache", "assets.json")
+        self.write("index.css", "body {}")
+        self.write("images/a.png", "png bytes")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text, root=None):
+        path = os.path.join(root or self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def sync(self, **kwargs):
+        return sync_dir(self.source, self.dest, self.manifest, **kwargs)
+
+    def read(self, name):
+        with open(os.path.join(self.dest, name)) as f:
+            return f.read()
+
+    def test_initial_copy(self):
+        self.assertEqual(self.sync(), {"copied": 2, "unchanged": 0, "removed": 0})
+        self.assertEqual(self.read("images/a.png"), "png bytes")
+
+    def test_noop_resync_keeps_mtime(self):
+        self.sync()
+        before = os.stat(os.path.join(self.dest, "index.css")).st_mtime_ns
+        self.assertEqual(self.sync(), {"copied": 0, "unchanged": 2, "removed": 0})
+        self.assertEqual(os.stat(os.path.join(self.dest, "index.css")).st_mtime_ns, before)
+
+    def test_changed_file_copied(self):
+        self.sync()
+        self.write("index.css", "body { color: red }")
+        self.assertEqual(self.sync()["copied"], 1)
+        self.assertEqual(self.read("index.css"), "body { color: red }")
+
+    def test_orphans_removed_pages_kept(self):
+        self.sync()
+        page = self.write("index.html", "<p>generated</p>", self.dest)
+        os.remove(os.path.join(self.source, "images", "a.png"))
+        self.assertEqual(self.sync()["removed"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+        self.assertTrue(os.path.exists(page))
+
+    def test_hardlink(self):
+        self.sync(link=True)
+        dest = os.path.join(self.dest, "index.css")
+        self.assertTrue(os.path.samefile(dest, os.path.join(self.source, "index.css")))
+        self.assertEqual(self.sync(link=True)["unchanged"], 2)
+
+    def test_linked_dest_replaced_not_written_through(self):
+        other = self.write("other.css", "other", self.dir)
+        os.makedirs(self.dest)
+        os.link(other, os.path.join(self.dest, "index.css"))
+        self.sync()
+        self.assertEqual(self.read("index.css"), "body {}")
+        with open(other) as f:
+            self.assertEqual(f.read(), "other")
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.source = os.path.join(self.dir, "static")
+        self.dest = os.path.join(self.dir, "docs")
+        self.hashes = HashCache(os.path.join(self.dir, "cache", "hashes.json"))
+        self.css = self.write("index.css", "body {}")
+        self.write("images/a.png", "png bytes")
+        self.write("favicon.ico", "icon")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.source, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(fingerprinted_name("images/a.png", "0123456789abcdef"), "images/a.01234567.png")
+
+    def test_map(self):
+        amap = fingerprint_assets(self.source, self.hashes)
+        digest = file_hash(self.css)[:8]
+        self.assertEqual(amap.get("/index.css"), f"/index.{digest}.css")
+        self.assertIn("/images/a.png", amap.urls)
+        self.assertNotIn("/favicon.ico", amap.urls)
+
+    def test_key_follows_content(self):
+        before = fingerprint_assets(self.source, self.hashes)
+        self.assertEqual(fingerprint_assets(self.source, self.hashes).key, before.key)
+        self.write("index.css", "body { color: red }")
+        self.assertNotEqual(fingerprint_assets(self.source, self.hashes).key, before.key)
+
+    def test_unchanged_files_not_rehashed(self):
+        self.hashes.digest(self.css)
+        self.hashes.save()
+        hashes = HashCache(self.hashes.path)
+        with mock.patch.object(assets, "file_hash") as rehash:
+            hashes.digest(self.css)
+        rehash.assert_not_called()
+        self.assertFalse(hashes.changed)
+
+    def test_sync_publishes_fingerprinted_names(self):
+        amap = fingerprint_assets(self.source, self.hashes)
+        manifest = os.path.join(self.dir, "cache", "assets.json")
+        sync_dir(self.source, self.dest, manifest, assets=amap)
+        self.assertTrue(os.path.exists(os.path.join(self.dest, amap.get("/images/a.png")[1:])))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "favicon.ico")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "index.css")))
+
+        # the old name is an orphan once the contents change
+        old = os.path.join(self.dest, amap.get("/index.css")[1:])
+        self.write("index.css", "body { color: red }")
+        amap = fingerprint_assets(self.source, self.hashes)
+        self.assertEqual(sync_dir(self.source, self.dest, manifest, assets=amap)["removed"], 1)
+        self.assertFalse(os.path.exists(old))
+
+    def test_empty_map_is_falsy(self):
+        self.assertFalse(AssetMap({}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from textnode import BlockType
+from blocks import parse_block, ParsedBlock
+
+
+class TestParseBlock(unittest.TestCase):
+    def test_heading(self):
+        self.assertEqual(parse_block("### Third level"), ParsedBlock(BlockType.HEADING, ["Third level"], 3))
+        self.assertEqual(parse_block("####### seven").block_type, BlockType.PARAGRAPH)
+
+    def test_code(self):
+        self.assertEqual(parse_block("```\nprint(x)\n```"), ParsedBlock(BlockType.CODE, ["print(x)\n"]))
+
+    def test_quote(self):
+        self.assertEqual(parse_block(">Quote\n> more"), ParsedBlock(BlockType.QUOTE, ["Quote\n more"]))
+
+    def test_unordered(self):
+        self.assertEqual(parse_block("- one\n- **two**"), ParsedBlock(BlockType.UNORDERED_LIST, ["one", "**two**"]))
+
+    def test_ordered(self):
+        self.assertEqual(parse_block("1. one\n2. two  "), ParsedBlock(BlockType.ORDERED_LIST, ["one", "two"]))
+
+    def test_mixed_lines_are_a_paragraph(self):
+        self.assertEqual(
+            parse_block("- one\n1. two\n> three"),
+            ParsedBlock(BlockType.PARAGRAPH, ["- one 1. two > three"]),
+        )
+
+    def test_empty_line_in_quote(self):
+        self.assertEqual(parse_block(">a\n\n>b").block_type, BlockType.PARAGRAPH)
+
+
+if __name__ == "__main__":
+    unittest.main()
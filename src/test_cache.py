@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+import convert
+from cache import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_counters(self):
+        cache = LRUCache(4)
+        cache.get("x")
+        cache.put("x", 1)
+        cache.get("x")
+        self.assertEqual(cache.stats(), {"size": 1, "maxsize": 4, "hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_resize_and_disable(self):
+        cache = LRUCache(4)
+        for i in range(4):
+            cache.put(i, i)
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(3), 3)
+        cache.resize(0)
+        cache.put("y", 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_threads(self):
+        cache = LRUCache(64)
+
+        def work(offset):
+            for i in range(2000):
+                key = (i + offset) % 100
+                if cache.get(key) is None:
+                    cache.put(key, key)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(len(cache), 64)
+        self.assertEqual(cache.hits + cache.misses, 8000)
+
+
+class TestInlineCache(unittest.TestCase):
+    def setUp(self):
+        convert.inline_cache.clear()
+
+    def test_repeated_fragment_hits(self):
+        first = convert.text_to_children("a [nav](/home) link")
+        second = convert.text_to_children("a [nav](/home) link")
+        self.assertEqual([n.to_html() for n in first], [n.to_html() for n in second])
+        self.assertIsNot(first, second)
+        self.assertEqual((convert.inline_cache.hits, convert.inline_cache.misses), (1, 1))
+
+    def test_long_fragments_not_cached(self):
+        convert.text_to_children("x" * (convert.INLINE_CACHE_MAX_TEXT + 1))
+        self.assertEqual(len(convert.inline_cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import compress
+from assets import HashCache
+from compress import CODECS, compress_outputs, register_codec
+
+
+class TestCompressOutputs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.root = os.path.join(self.dir, "docs")
+        self.page = self.write("blog/index.html", "<p>hello</p>" * 100)
+        self.write("images/a.png", "png bytes" * 100)
+        self.cache = os.path.join(self.dir, "cache", "compressed.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def compress(self, **kwargs):
+        hashes = HashCache(os.path.join(self.dir, "cache", "hashes.json"))
+        return compress_outputs(self.root, ["gzip"], hashes=hashes, cache_path=self.cache, **kwargs)
+
+    def test_gzip_sibling(self):
+        self.assertEqual(self.compress(), {"compressed": 1, "unchanged": 0, "skipped": 0, "removed": 0})
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "images", "a.png.gz")))
+
+    def test_unchanged_outputs_skipped(self):
+        self.compress()
+        with mock.patch.object(compress, "_compress_job") as job:
+            self.assertEqual(self.compress()["unchanged"], 1)
+        job.assert_not_called()
+        # a different level is a different output
+        self.assertEqual(self.compress(level=1)["compressed"], 1)
+
+    def test_not_smaller_skipped(self):
+        tiny = self.write("tiny.txt", "x")
+        self.assertEqual(self.compress()["skipped"], 1)
+        self.assertFalse(os.path.exists(tiny + ".gz"))
+        self.assertEqual(self.compress()["skipped"], 1)
+
+    def test_orphaned_sibling_removed(self):
+        self.compress()
+        os.remove(self.page)
+        self.assertEqual(self.compress()["removed"], 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_shipped_sibling_kept(self):
+        shipped = self.write("fonts.css.gz", "precompressed elsewhere")
+        for _ in range(2):
+            self.assertEqual(self.compress()["removed"], 0)
+            self.assertTrue(os.path.exists(shipped))
+        # nor when the output next to it does not shrink
+        tiny = self.write("tiny.txt", "x")
+        self.write("tiny.txt.gz", "shipped")
+        self.compress()
+        self.assertTrue(os.path.exists(tiny + ".gz"))
+
+    def test_pool(self):
+        for i in range(4):
+            self.write(f"page-{i}.html", f"<p>{i}</p>" * 100)
+        self.assertEqual(self.compress(jobs=2)["compressed"], 5)
+
+    def test_registered_codec(self):
+        register_codec("reverse", ".rev", lambda data, level: data[:len(data) // 2], 0)
+        try:
+            hashes = HashCache(os.path.join(self.dir, "cache", "hashes.json"))
+            compress_outputs(self.root, ["gzip", "reverse"], hashes=hashes, cache_path=self.cache)
+        finally:
+            del CODECS["reverse"]
+        self.assertTrue(os.path.exists(self.page + ".rev"))
+        self.assertTrue(os.path.exists(self.page + ".gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
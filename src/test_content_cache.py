@@ -0,0 +1,122 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import convert
+from content_cache import ContentCache
+from profiling import PageProfile
+
+
+class TestContentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.cache = ContentCache(os.path.join(self.dir, "cache"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        key = self.cache.key("# Hi\n\nthere", "1")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "Hi", "<div><h1>Hi</h1>\n<p>there</p></div>", {"unquoted": 3})
+        self.assertEqual(self.cache.get(key), ("Hi", "<div><h1>Hi</h1>\n<p>there</p></div>", {"unquoted": 3}))
+
+    def test_key_covers_variant(self):
+        self.assertNotEqual(self.cache.key("# Hi", "1"), self.cache.key("# Hi", "2"))
+
+    def test_prune(self):
+        old, used = self.cache.key("old", ""), self.cache.key("used", "")
+        self.cache.put(old, "Old", "<p>old</p>")
+        self.cache.put(used, "Used", "<p>used</p>")
+        week_ago = time.time() - 7 * 24 * 60 * 60
+        for key in (old, used):
+            os.utime(self.cache._path(key), (week_ago, week_ago))
+        self.cache.get(used)
+        self.assertEqual(self.cache.prune(max_age=24 * 60 * 60), 1)
+        self.assertIsNone(self.cache.get(old))
+        self.assertIsNotNone(self.cache.get(used))
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_template_change_skips_parsing(self):
+        source = self.write("index.md", "# Home\n\n[about](/about)")
+        dest = os.path.join(self.dir, "index.html")
+        template = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        convert.generate_page(source, template, dest, content_cache=self.cache)
+
+        self.write("template.html", "<h1>{{ Title }}</h1>\n{{ Content }}")
+        profile = PageProfile(source, dest)
+        with mock.patch.object(convert, "markdown_to_blocks", side_effect=AssertionError("parsed")):
+            convert.generate_page(source, template, dest, basepath="/ssg/", profile=profile, content_cache=self.cache)
+        self.assertTrue(profile.content_cached)
+        with open(dest) as f:
+            self.assertEqual(f.read(), '<h1>Home</h1>\n<div><h1>Home</h1><p><a href="/ssg/about">about</a></p></div>')
+
+    def test_minified_content_cached_apart(self):
+        source = self.write("index.md", "# Home\n\n[about](/about)")
+        template = self.write("template.html", "{{ Content }}")
+        convert.generate_page(source, template, os.path.join(self.dir, "a.html"), content_cache=self.cache)
+        profile = PageProfile(source, "b.html")
+        try:
+            convert.generate_page(source, template, os.path.join(self.dir, "b.html"), profile=profile, minify=True, content_cache=self.cache)
+        finally:
+            convert.attribute_minifier.enabled = False
+        self.assertFalse(profile.content_cached)
+        self.assertEqual(profile.bytes_saved, 2)
+
+    def test_same_inputs_reuse_page(self):
+        source = self.write("index.md", "# Home")
+        template = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        convert.generate_page(source, template, os.path.join(self.dir, "a.html"), content_cache=self.cache)
+        profile = PageProfile(source, "b.html")
+        with mock.patch.object(convert, "markdown_to_blocks", side_effect=AssertionError("parsed")):
+            convert.generate_page(source, template, os.path.join(self.dir, "b.html"), profile=profile, content_cache=self.cache)
+        self.assertTrue(profile.page_cached)
+        with open(os.path.join(self.dir, "a.html")) as a, open(os.path.join(self.dir, "b.html")) as b:
+            self.assertEqual(a.read(), b.read())
+        # a different basepath is a different page, with the same content
+        profile = PageProfile(source, "c.html")
+        convert.generate_page(source, template, os.path.join(self.dir, "c.html"), basepath="/ssg/", profile=profile, content_cache=self.cache)
+        self.assertFalse(profile.page_cached)
+        self.assertTrue(profile.content_cached)
+
+    def test_export_import(self):
+        for text in ["one", "two"]:
+            self.cache.put(self.cache.key(text, ""), text, f"<p>{text}</p>")
+        archive = os.path.join(self.dir, "cache.tar.gz")
+        self.assertEqual(self.cache.export(archive), 2)
+        with open(archive, "rb") as f:
+            first = f.read()
+        time.sleep(0.01)
+        self.cache.export(archive)
+        with open(archive, "rb") as f:
+            self.assertEqual(f.read(), first)
+
+        other = ContentCache(os.path.join(self.dir, "other"))
+        self.assertEqual(other.import_archive(archive), (2, set(self.cache.keys())))
+        self.assertEqual(other.get(self.cache.key("two", "")), ("two", "<p>two</p>", {}))
+        self.assertEqual(other.import_archive(archive)[0], 0)
+
+    def test_push_pull(self):
+        store = os.path.join(self.dir, "store")
+        self.cache.put(self.cache.key("one", ""), "one", "<p>one</p>")
+        self.assertEqual(self.cache.push(store, set()), 1)
+        other = ContentCache(os.path.join(self.dir, "other"))
+        imported, known = other.pull(store)
+        self.assertEqual(imported, 1)
+        other.put(other.key("two", ""), "two", "<p>two</p>")
+        # only what the store lacks goes back
+        self.assertEqual(other.push(store, known), 1)
+        self.assertEqual(len(os.listdir(store)), 2)
+        self.assertEqual(ContentCache(os.path.join(self.dir, "third")).pull(store)[0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,10 @@
+import io
+import os
+import tempfile
 import unittest
 
+import convert
+
 from textnode import TextNode, TextType, BlockType
 # from htmlnode import LeafNode
 from convert import (
@@ -14,6 +19,8 @@ from convert import (
                         block_to_block_type,
                         markdown_to_html_node,
                         extract_title,
+                        read_blocks,
+                        StreamedDocument,
                     )
 
 
@@ -57,6 +64,17 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(html_node.props["src"], "https://imgur.com/lolcat")
         self.assertEqual(html_node.props["alt"], "This is an image node")
 
+    def test_image_sizes(self):
+        from images import ImageSizes
+        convert.use_images(ImageSizes({"/images/a.png": (10, 20)}))
+        try:
+            html = convert.markdown_to_html_node("![a](/images/a.png)").to_html()
+        finally:
+            convert.use_images(None)
+        self.assertEqual(html, '<div><p><img src="/images/a.png" alt="a" width="10" height="20" loading="lazy" decoding="async"></img></p></div>')
+        # cached fragments rendered with the sizes are dropped with them
+        self.assertEqual(convert.markdown_to_html_node("![a](/images/a.png)").to_html(), '<div><p><img src="/images/a.png" alt="a"></img></p></div>')
+
 
 
 class TestSplitDelimiter(unittest.TestCase):
@@ -385,6 +403,41 @@ Also not the header
 
 
 
+class TestStreamingBlocks(unittest.TestCase):
+    md = "# Title\n\n\n\nA **para**\nover lines\n  \nstill para\n\n \n\n- one\n- two\n\n\n  trailing  \n"
+
+    def test_read_blocks_matches_markdown_to_blocks(self):
+        for md in [self.md, "", "\n\n", "single", "a\n\n\nb", "a\r\n\r\nb"]:
+            self.assertEqual(list(read_blocks(io.StringIO(md))), markdown_to_blocks(md), repr(md))
+
+    def test_read_blocks_is_lazy(self):
+        lines = iter(["first\n", "\n", "second\n"])
+        blocks = read_blocks(lines)
+        self.assertEqual(next(blocks), "first")
+        self.assertEqual(next(lines), "second\n")
+
+    def test_streamed_document(self):
+        out = io.StringIO()
+        StreamedDocument(read_blocks(io.StringIO(self.md))).render_to(out)
+        self.assertEqual(out.getvalue(), markdown_to_html_node(self.md).to_html())
+
+    def test_generate_page_streamed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "index.md")
+            template = os.path.join(tmp, "template.html")
+            with open(source, "w") as f:
+                f.write(self.md)
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            convert.generate_page(source, template, os.path.join(tmp, "whole.html"))
+            convert.generate_page(source, template, os.path.join(tmp, "streamed.html"), stream_threshold=0)
+            with open(os.path.join(tmp, "whole.html")) as whole, open(os.path.join(tmp, "streamed.html")) as streamed:
+                self.assertEqual(whole.read(), streamed.read())
+
+    def test_extract_title_from_lines(self):
+        self.assertEqual(extract_title(io.StringIO("intro\n# Test  \nbody\n")), "Test")
+
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -38,3 +39,28 @@ class TestHTMLNode(unittest.TestCase):
             parent_node.to_html(),
             "<div><span><b>grandchild</b></span></div>",
         )
+
+    def test_render_to_writers(self):
+        node = ParentNode("p", [LeafNode(None, "Hello, "), LeafNode("b", "world")])
+        buffer = io.StringIO()
+        node.render_to(buffer)
+        fragments = []
+        node.render_to(fragments)
+        self.assertEqual(buffer.getvalue(), "<p>Hello, <b>world</b></p>")
+        self.assertEqual(fragments, ["<p>", "Hello, ", "<b>world</b>", "</p>"])
+
+    def test_render_to_deep(self):
+        node = LeafNode("b", "deep")
+        for _ in range(200):
+            node = ParentNode("span", [node])
+        written = []
+        node.render_to(lambda s: written.append(len(s)))
+        self.assertEqual(max(written), len("<b>deep</b>"))
+        self.assertEqual(node.to_html(), "<span>" * 200 + "<b>deep</b>" + "</span>" * 200)
+
+    def test_compact_nodes(self):
+        a = LeafNode("b", "one", {})
+        b = ParentNode("".join(["b"]), [a])
+        self.assertFalse(hasattr(a, "__dict__"))
+        self.assertIsNone(a.props)
+        self.assertIs(a.tag, b.tag)
@@ -0,0 +1,100 @@
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import images
+from assets import HashCache
+from images import ImageSizes, image_size, measure_images
+
+
+def png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + b"\x00" * 10
+    return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_png(self):
+        self.assertEqual(self.size_of("a.png", png(1100, 438)), (1100, 438))
+
+    def test_gif(self):
+        self.assertEqual(self.size_of("a.gif", b"GIF89a" + struct.pack("<HH", 16, 9) + b"\x00" * 4), (16, 9))
+
+    def test_jpeg_skips_segments(self):
+        self.assertEqual(self.size_of("a.JPG", jpeg(640, 480)), (640, 480))
+
+    def test_webp(self):
+        lossy = b"RIFF" + b"\x00" * 4 + b"WEBPVP8 " + b"\x00" * 10 + struct.pack("<HH", 300, 200)
+        self.assertEqual(self.size_of("a.webp", lossy), (300, 200))
+        bits = (300 - 1) | (200 - 1) << 14
+        lossless = b"RIFF" + b"\x00" * 4 + b"WEBPVP8L" + b"\x00" * 5 + bits.to_bytes(4, "little") + b"\x00" * 5
+        self.assertEqual(self.size_of("b.webp", lossless), (300, 200))
+        extended = b"RIFF" + b"\x00" * 4 + b"WEBPVP8X" + b"\x00" * 8 + (299).to_bytes(3, "little") + (199).to_bytes(3, "little")
+        self.assertEqual(self.size_of("c.webp", extended), (300, 200))
+
+    def test_unrecognised(self):
+        self.assertIsNone(self.size_of("a.png", b"not a png"))
+        self.assertIsNone(self.size_of("a.jpg", jpeg(1, 1)[:10]))
+        self.assertIsNone(self.size_of("a.svg", b"<svg/>"))
+
+
+class TestMeasureImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.source = os.path.join(self.dir, "static")
+        os.makedirs(os.path.join(self.source, "images"))
+        self.write("images/a.png", png(10, 20))
+        self.write("index.css", b"body {}")
+        self.cache = os.path.join(self.dir, "cache", "images.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        with open(os.path.join(self.source, name), "wb") as f:
+            f.write(data)
+
+    def measure(self):
+        return measure_images(self.source, HashCache(os.path.join(self.dir, "cache", "hashes.json")), self.cache)
+
+    def test_sizes(self):
+        self.assertEqual(self.measure().sizes, {"/images/a.png": (10, 20)})
+
+    def test_cached_by_hash(self):
+        first = self.measure()
+        # a copy has the same hash, so it is not read either
+        self.write("images/b.png", png(10, 20))
+        with mock.patch.object(images, "image_size") as read:
+            second = self.measure()
+        read.assert_not_called()
+        self.assertEqual(second.sizes["/images/b.png"], (10, 20))
+        self.assertNotEqual(first.key, second.key)
+
+    def test_attributes(self):
+        sizes = ImageSizes({"/a.png": (10, 20)})
+        self.assertEqual(sizes.attributes("/a.png"),
+                         {"width": "10", "height": "20", "loading": "lazy", "decoding": "async"})
+        self.assertEqual(sizes.attributes("https://example.com/b.png"), {"loading": "lazy", "decoding": "async"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from textnode import TextNode, TextType
+from inline import tokenize_inline
+from convert import text_to_text_nodes_multipass
+
+
+class TestTokenizeInline(unittest.TestCase):
+    def test_matches_multipass(self):
+        for text in [
+            "plain text only",
+            "This is **text** with an _italic_ word and a `code block`",
+            "an ![image](https://i.imgur.com/zjjcJKZ.png) and [link](https://boot.dev) and ![second](b.png)",
+            "[link](https://i.imgur.com/zjjcJKZ.png) and not another",
+            "![](empty-alt.png) trailing",
+            "a****b",
+            "***a***",
+            "unclosed [bracket and ! bang and ](paren",
+        ]:
+            self.assertListEqual(tokenize_inline(text), text_to_text_nodes_multipass(text), text)
+
+    def test_unmatched_delimiter(self):
+        with self.assertRaises(Exception):
+            tokenize_inline("this **never closes")
+
+    def test_link_url_with_underscore(self):
+        self.assertListEqual(
+            tokenize_inline("see [docs](https://example.com/a_b) now"),
+            [
+                TextNode("see ", TextType.NORMAL),
+                TextNode("docs", TextType.LINK, "https://example.com/a_b"),
+                TextNode(" now", TextType.NORMAL),
+            ],
+        )
+
+    def test_code_is_literal(self):
+        self.assertListEqual(
+            tokenize_inline("`a_b **c**`"),
+            [TextNode("a_b **c**", TextType.CODETEXT)],
+        )
+
+    def test_brackets_inside_links(self):
+        # not matched whole by _OPENER, so left to _bracket
+        self.assertListEqual(tokenize_inline("[a [b](c)"), [TextNode("a [b", TextType.LINK, "c")])
+        self.assertListEqual(
+            tokenize_inline("![a](b(c)) x"),
+            [TextNode("a", TextType.IMAGE, "b(c"), TextNode(") x", TextType.NORMAL)],
+        )
+
+    def test_bang_before_link(self):
+        self.assertListEqual(
+            tokenize_inline("wow![x]"),
+            [TextNode("wow![x]", TextType.NORMAL)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+import convert
+from fixtures import SiteTestCase
+from main import walk_pages, stream_pages, PageError, RenderSettings
+from profiling import BuildSummary
+
+
+class TestGeneratePages(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_pages(["b", "a", "c/d", "c/e"])
+
+    def test_walk_is_sorted(self):
+        pages = list(walk_pages(self.content, "out", make_dirs=False))
+        self.assertEqual(
+            [dest for _, dest in pages],
+            ["out/a/index.html", "out/b/index.html", "out/c/d/index.html", "out/c/e/index.html"],
+        )
+
+    def test_walk_deep_tree(self):
+        path = os.path.join(self.dir, "deep")
+        for depth in range(200):
+            path = os.path.join(path, f"d{depth}")
+        os.makedirs(path)
+        with open(os.path.join(path, "index.md"), "w") as f:
+            f.write("# Deep")
+        pages = list(walk_pages(os.path.join(self.dir, "deep"), os.path.join(self.dir, "deep-out")))
+        self.assertEqual(len(pages), 1)
+        self.assertTrue(pages[0][1].endswith("/d199/index.html"))
+
+    def test_streamed_matches_listed(self):
+        listed = self.build(os.path.join(self.dir, "listed"), 1)
+        for jobs in (1, 2):
+            publish = os.path.join(self.dir, f"streamed-{jobs}")
+            settings = RenderSettings(self.template, "/ssg/", memory_budget=64 << 20)
+            summary = stream_pages(walk_pages(self.content, publish), settings, jobs, BuildSummary(keep=1))
+            self.assertEqual(summary.pages, 4)
+            # lowered for this build's pages only
+            self.assertEqual(settings.stream_threshold(), 4 << 20)
+            self.assertEqual(convert.STREAM_THRESHOLD, 8 << 20)
+            self.assertEqual(len(summary.slowest()), 1)
+            for name, html in listed.items():
+                with open(os.path.join(publish, name)) as f:
+                    self.assertEqual(f.read(), html)
+
+    def test_parallel_matches_serial(self):
+        serial = self.build(os.path.join(self.dir, "serial"), 1)
+        parallel = self.build(os.path.join(self.dir, "parallel"), 3)
+        self.assertEqual(serial, parallel)
+        self.assertIn('<a href="/ssg/">', serial["a/index.html"])
+
+    def test_error_names_source(self):
+        broken = os.path.join(self.content, "c", "e", "index.md")
+        with open(broken, "w") as f:
+            f.write("no title here")
+        with self.assertRaises(PageError) as cm:
+            self.build(os.path.join(self.dir, "out"), 2)
+        self.assertEqual(cm.exception.source, broken)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from manifest import GENERATOR_VERSION, Manifest, SqliteManifest
+
+
+class TestManifest(unittest.TestCase):
+    manifest_class = Manifest
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.template = os.path.join(self.dir, "template.html")
+        self.source = os.path.join(self.dir, "index.md")
+        self.dest = os.path.join(self.dir, "index.html")
+        self.manifest_path = os.path.join(self.dir, "cache", "manifest.json")
+        for path, text in [(self.template, "{{ Content }}"), (self.source, "# Title"), (self.dest, "<p></p>")]:
+            with open(path, "w") as f:
+                f.write(text)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, basepath="/"):
+        manifest = self.manifest_class(self.manifest_path, self.template, basepath)
+        key = manifest.page_key(self.source)
+        fresh = manifest.is_fresh(self.dest, key)
+        manifest.record(self.source, self.dest, key)
+        manifest.save()
+        return fresh
+
+    def test_unchanged_is_fresh(self):
+        self.assertFalse(self.build())
+        self.assertTrue(self.build())
+
+    def test_source_change(self):
+        self.build()
+        with open(self.source, "a") as f:
+            f.write("\n\nmore")
+        self.assertFalse(self.build())
+
+    def test_template_and_basepath_change(self):
+        self.build()
+        self.assertFalse(self.build("/ssg/"))
+        with open(self.template, "a") as f:
+            f.write("<footer></footer>")
+        self.assertFalse(self.build("/ssg/"))
+
+    def test_missing_output(self):
+        self.build()
+        os.remove(self.dest)
+        self.assertFalse(self.build())
+
+    def test_stale_outputs(self):
+        self.build()
+        manifest = self.manifest_class(self.manifest_path, self.template, "/")
+        self.assertEqual(list(manifest.stale_outputs()), [self.dest])
+
+
+# the same checks, against the on-disk manifest --memory-budget builds use
+class TestSqliteManifest(TestManifest):
+    manifest_class = SqliteManifest
+
+    def test_recorded_pages_are_not_stale(self):
+        self.build()
+        manifest = SqliteManifest(self.manifest_path, self.template, "/")
+        manifest.record(self.source, self.dest, manifest.page_key(self.source))
+        self.assertEqual(list(manifest.stale_outputs()), [])
+        manifest.save()
+        self.assertTrue(self.build())
+
+    def test_version_change(self):
+        self.build()
+        manifest = SqliteManifest(self.manifest_path, self.template, "/")
+        manifest.db.execute("UPDATE meta SET value = 'old' WHERE name = 'version'")
+        manifest.save()
+        self.assertFalse(self.build())
+        manifest = SqliteManifest(self.manifest_path, self.template, "/")
+        self.assertEqual(dict(manifest.db.execute("SELECT * FROM meta"))["version"], GENERATOR_VERSION)
+        manifest.save()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import memory
+from convert import inline_cache
+from memory import MemoryBudget
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def check(self, budget, *rss):
+        out = io.StringIO()
+        with mock.patch.object(memory, "current_rss", side_effect=list(rss)), redirect_stdout(out):
+            budget.check()
+        return out.getvalue()
+
+    def test_under_budget(self):
+        budget = MemoryBudget(100 << 20)
+        inline_cache.put("kept", "x")
+        self.assertEqual(self.check(budget, 50 << 20), "")
+        self.assertEqual(budget.trims, 0)
+        self.assertEqual(budget.peak, 50 << 20)
+        self.assertIsNotNone(inline_cache.get("kept"))
+
+    def test_trims_then_warns_once(self):
+        budget = MemoryBudget(100 << 20)
+        inline_cache.put("dropped", "x")
+        # back under the budget once trimmed: no warning
+        self.assertEqual(self.check(budget, 150 << 20, 90 << 20), "")
+        self.assertEqual(budget.trims, 1)
+        self.assertIsNone(inline_cache.get("dropped"))
+        self.assertIn("RSS 200 MiB is over the 100 MiB memory budget", self.check(budget, 200 << 20, 180 << 20))
+        self.assertEqual(self.check(budget, 200 << 20, 180 << 20), "")
+        self.assertEqual((budget.trims, budget.peak), (3, 200 << 20))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from htmlnode import LeafNode, ParentNode, attribute_minifier
+from minify import can_unquote, minify_segments
+from template import Slot, Template
+
+
+class TestMinifySegments(unittest.TestCase):
+    def test_whitespace_between_tags(self):
+        html = '<html>\n  <head>\n    <title>A  b</title>\n  </head>\n\n  <body>\n    <b>x</b> <i>y</i>\n  </body>\n</html>\n'
+        self.assertEqual(minify_segments([html]), ["<html><head><title>A b</title></head><body><b>x</b> <i>y</i></body></html>"])
+
+    def test_text_next_to_tag_keeps_a_space(self):
+        self.assertEqual(minify_segments(['<p>Built by <a href="/about">me</a>\n  in 2024</p>']),
+                         ['<p>Built by <a href=/about>me</a> in 2024</p>'])
+        self.assertEqual(minify_segments(["<p>Hello,\n<b>world</b></p>"]), ["<p>Hello, <b>world</b></p>"])
+        # next to a slot, which holds text as far as the literals can tell
+        self.assertEqual(minify_segments(["<p>\n  ", Slot("Title", ""), "\n</p>\n"]), ["<p> ", Slot("Title", ""), " </p>"])
+
+    def test_inline_elements_stay_apart(self):
+        nav = '<nav>\n  <a href="/">Home</a>\n  <a href="/blog">Blog</a>\n</nav>'
+        self.assertEqual(minify_segments([nav]), ["<nav><a href=/>Home</a> <a href=/blog>Blog</a></nav>"])
+        self.assertEqual(minify_segments(["<p><b>x</b>\n<i>y</i></p>"]), ["<p><b>x</b> <i>y</i></p>"])
+        self.assertEqual(minify_segments(["<p>a <code>b</code>\n  <em>c</em></p>"]), ["<p>a <code>b</code> <em>c</em></p>"])
+
+    def test_comments(self):
+        self.assertEqual(minify_segments(["<p><!-- note -->a</p><!--[if IE]><p>ie</p><![endif]-->"]),
+                         ["<p>a</p><!--[if IE]><p>ie</p><![endif]-->"])
+
+    def test_optional_quotes(self):
+        self.assertEqual(minify_segments(['<meta charset="utf-8" /><a class="x y" href="/a/">a</a><br class="z"/>']),
+                         ['<meta charset=utf-8 /><a class="x y" href=/a/>a</a><br class="z"/>'])
+
+    def test_preformatted_left_alone(self):
+        segments = ['<div>\n  <pre class="code">\n  keep  ', Slot("Code", ""), '\n  this\n</pre>\n  <p class="a">\n</div>']
+        self.assertEqual(minify_segments(segments),
+                         ['<div><pre class="code">\n  keep  ', Slot("Code", ""), '\n  this\n</pre><p class=a></div>'])
+
+    def test_can_unquote(self):
+        self.assertTrue(can_unquote("/images/a.png"))
+        self.assertFalse(can_unquote("two words"))
+        self.assertFalse(can_unquote(""))
+
+
+class TestMinifiedRendering(unittest.TestCase):
+    def tearDown(self):
+        attribute_minifier.enabled = False
+
+    def test_attributes(self):
+        node = ParentNode("p", [LeafNode("a", "home", {"href": "/", "title": "Go home"})])
+        attribute_minifier.enabled = True
+        saved = attribute_minifier.saved
+        self.assertEqual(node.to_html(), '<p><a href=/ title="Go home">home</a></p>')
+        self.assertEqual(attribute_minifier.saved - saved, 2)
+
+    def test_template(self):
+        text = '<head>\n  <link href="/index.css" />\n</head>\n<main>{{ Content }}</main>\n'
+        template = Template.compile(text, "/ssg/", minify=True)
+        attribute_minifier.enabled = True
+        html = template.render({"Content": ParentNode("p", [LeafNode("a", "home", {"href": "/"})])})
+        self.assertEqual(html, '<head><link href=/ssg/index.css /></head><main><p><a href=/ssg/>home</a></p></main>')
+        plain = Template.compile(text, "/ssg/")
+        self.assertEqual(template.saved, len(plain.render({"Content": ""})) - len(template.render({"Content": ""})))
+
+
+if __name__ == "__main__":
+    unittest.main()
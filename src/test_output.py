@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from output import OutputWriter
+
+
+class TestOutputWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "a", "b", "index.html")
+        self.writer = OutputWriter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self):
+        with open(self.path) as f:
+            return f.read()
+
+    def test_write_creates_dirs(self):
+        self.assertTrue(self.writer.write(self.path, "<p>one</p>"))
+        self.assertEqual(self.read(), "<p>one</p>")
+
+    def test_identical_write_skipped(self):
+        self.writer.write(self.path, "<p>one</p>")
+        os.utime(self.path, ns=(0, 0))
+        self.assertFalse(self.writer.write(self.path, b"<p>one</p>"))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertEqual((self.writer.written, self.writer.unchanged), (1, 1))
+
+    def test_same_size_different_bytes(self):
+        self.writer.write(self.path, "<p>one</p>")
+        self.assertTrue(self.writer.write(self.path, "<p>two</p>"))
+        self.assertEqual(self.read(), "<p>two</p>")
+
+    def test_rewrite_does_not_append(self):
+        self.writer.write(self.path, "<p>one</p>")
+        self.writer.write(self.path, "<p>x</p>")
+        self.assertEqual(self.read(), "<p>x</p>")
+
+    def test_open_text(self):
+        with self.writer.open_text(self.path) as f:
+            f.write("<p>streamed</p>")
+        os.utime(self.path, ns=(0, 0))
+        with self.writer.open_text(self.path) as f:
+            f.write("<p>streamed</p>")
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_failed_stream_leaves_old_file(self):
+        self.writer.write(self.path, "<p>old</p>")
+        with self.assertRaises(RuntimeError):
+            with self.writer.open_text(self.path) as f:
+                f.write("<p>half")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.read(), "<p>old</p>")
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["index.html"])
+
+    def test_directory_removed_between_writes(self):
+        self.writer.write(self.path, "one")
+        os.remove(self.path)
+        os.rmdir(os.path.dirname(self.path))
+        self.assertTrue(self.writer.write(self.path, "two"))
+
+
+if __name__ == "__main__":
+    unittest.main()
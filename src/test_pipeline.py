@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pipeline
+from fixtures import SiteTestCase
+from main import walk_pages, generate_page_recursive, PageError, RenderSettings
+from manifest import Manifest
+from pipeline import run_pipeline
+from profiling import BuildSummary
+
+
+class TestPipeline(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_pages([f"p{i:02}" for i in range(12)])
+
+    def test_matches_serial(self):
+        serial = self.build(os.path.join(self.dir, "serial"))
+        self.assertEqual(self.build(os.path.join(self.dir, "piped"), io=3), serial)
+        self.assertEqual(self.build(os.path.join(self.dir, "pooled"), jobs=2, io=2), serial)
+
+    def test_reads_overlap(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+        read = pipeline._read
+
+        def slow_read(page, profile, stream_threshold):
+            with lock:
+                active.append(page)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(page)
+            return read(page, profile, stream_threshold)
+
+        with mock.patch.object(pipeline, "_read", slow_read):
+            self.build(os.path.join(self.dir, "out"), io=4)
+        self.assertGreater(max(peak), 1)
+
+    def test_first_failing_page_reported(self):
+        for name in ["p03/index.md", "p07/index.md"]:
+            self.write(os.path.join(self.content, name), "no title here")
+        for jobs in (1, 2):
+            with self.assertRaises(PageError) as cm:
+                self.build(os.path.join(self.dir, "out"), jobs, io=2)
+            self.assertEqual(cm.exception.source, os.path.join(self.content, "p03", "index.md"))
+
+    def test_sources_hashed_ahead(self):
+        records = []
+        for io in (0, 3):
+            manifest = Manifest(os.path.join(self.dir, f"manifest-{io}.json"), self.template, "/")
+            profiles = generate_page_recursive(self.content, self.template, os.path.join(self.dir, "out"), "/", manifest,
+                                               settings=RenderSettings(self.template, "/", io=io))
+            self.assertEqual(len(profiles), 12)
+            records.append(list(manifest.records()))
+        self.assertEqual(records[0], records[1])
+
+    def test_failing_walk(self):
+        def pages():
+            yield from walk_pages(self.content, os.path.join(self.dir, "out"))
+            raise OSError("cannot hash content/broken.md")
+
+        for summary in (None, BuildSummary()):
+            with self.assertRaisesRegex(OSError, "broken.md"):
+                run_pipeline(pages(), RenderSettings(self.template, "/"), io=2, summary=summary)
+
+    def test_bounded_queues(self):
+        pages = list(walk_pages(self.content, os.path.join(self.dir, "out")))
+        stats = []
+        with mock.patch.object(pipeline.PipelineStats, "summary", lambda s: stats.append(s) or ""):
+            run_pipeline(pages, RenderSettings(self.template, "/"), io=1, queue_size=2)
+        self.assertLessEqual(stats[0].read_depth_max, 2)
+        self.assertLessEqual(stats[0].write_depth_max, 2)
+        self.assertEqual(stats[0].samples, len(pages) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
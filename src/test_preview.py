@@ -0,0 +1,105 @@
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from fixtures import SiteTestCase
+from main import generate_page_recursive
+from preview import PageRenderer, PreviewHandler, source_for
+
+
+class TestSourceFor(unittest.TestCase):
+    def test_mapping(self):
+        self.assertEqual(source_for("/", "content"), "content/index.md")
+        self.assertEqual(source_for("/blog/?page=2", "content"), "content/blog/index.md")
+        self.assertEqual(source_for("/blog/post.html", "content"), "content/blog/post.md")
+        self.assertEqual(source_for("/ssg/blog/", "content", "/ssg/"), "content/blog/index.md")
+
+    def test_outside_site(self):
+        self.assertIsNone(source_for("/index.css", "content"))
+        self.assertIsNone(source_for("/../secret.html", "content"))
+        self.assertIsNone(source_for("/other/", "content", "/ssg/"))
+
+
+class _QuietHandler(PreviewHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestPreview(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.dir, "static")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.pages = PageRenderer(self.template, "/", cache_size=2)
+
+    def test_cached_until_changed(self):
+        source = os.path.join(self.content, "index.md")
+        first = self.pages.get(source)
+        self.assertIn(b"<h1>Home</h1>", first.body)
+        self.assertIs(self.pages.get(source), first)
+        # touched but not edited
+        self.write(source, "# Home", bump=5)
+        self.assertIs(self.pages.get(source), first)
+        self.assertEqual(self.pages.renders, 1)
+        self.write(source, "# Changed", bump=10)
+        changed = self.pages.get(source)
+        self.assertIn(b"<h1>Changed</h1>", changed.body)
+        self.assertNotEqual(changed.etag, first.etag)
+
+    def test_template_change(self):
+        source = os.path.join(self.content, "index.md")
+        first = self.pages.get(source)
+        self.write(self.template, "<main>{{ Content }}</main>", bump=5)
+        self.assertTrue(self.pages.get(source).body.startswith(b"<main>"))
+        self.assertIsNot(self.pages.get(source), first)
+
+    def test_bounded(self):
+        for name in "abc":
+            self.write(os.path.join(self.content, name, "index.md"), f"# {name}")
+            self.pages.get(os.path.join(self.content, name, "index.md"))
+        self.assertEqual(len(self.pages.cache), 2)
+        self.assertIsNone(self.pages.get(os.path.join(self.content, "missing.md")))
+
+    def test_crlf_matches_build(self):
+        source = os.path.join(self.content, "crlf", "index.md")
+        markdown = "# Title\n\nSome *text*\nover two lines.\n\n```\ncode\n```\n\n- a\n- b\n"
+        os.makedirs(os.path.dirname(source))
+        with open(source, "wb") as f:
+            f.write(markdown.replace("\n", "\r\n").encode())
+        publish = os.path.join(self.dir, "docs")
+        generate_page_recursive(os.path.dirname(source), self.template, publish, "/")
+        with open(os.path.join(publish, "index.html"), "rb") as f:
+            self.assertEqual(self.pages.get(source).body, f.read())
+
+    def test_conditional_get(self):
+        handler = partial(_QuietHandler, directory=self.static, pages=self.pages, content=self.content)
+        httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{httpd.server_address[1]}"
+        try:
+            with urllib.request.urlopen(base + "/") as response:
+                etag = response.headers["ETag"]
+                self.assertIn(b"<h1>Home</h1>", response.read())
+            request = urllib.request.Request(base + "/index.html", headers={"If-None-Match": etag})
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(request)
+            self.assertEqual(cm.exception.code, 304)
+            with urllib.request.urlopen(base + "/index.css") as response:
+                self.assertEqual(response.read(), b"body {}")
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(base + "/missing/")
+            self.assertEqual(cm.exception.code, 404)
+            self.assertEqual(self.pages.renders, 1)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from convert import generate_page
+from fixtures import SiteTestCase
+from profiling import BuildSummary, PageProfile, print_build_summary, write_report, STAGES
+
+
+class TestProfiling(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profiles = []
+        for name, body in [("small", "# Small"), ("big", "# Big\n\n" + "\n\n".join(f"- **item** {i}" for i in range(200)))]:
+            source = self.write(f"{name}.md", body)
+            profile = PageProfile(source, os.path.join(self.dir, f"{name}.html"))
+            self.profiles.append(generate_page(source, self.template, profile.dest, profile=profile))
+
+    def test_page_profile(self):
+        small, big = self.profiles
+        self.assertEqual(set(small.stages), {"read", "blocks", "inline", "render", "template", "write"})
+        self.assertEqual(small.bytes_in, len("# Small"))
+        self.assertEqual(small.bytes_out, os.path.getsize(small.dest))
+        # div > h1 > text
+        self.assertEqual(small.nodes, 3)
+        self.assertGreater(big.nodes, small.nodes)
+
+    def test_disabled_profile_records_nothing(self):
+        source, dest = self.profiles[0].source, os.path.join(self.dir, "off.html")
+        profile = generate_page(source, self.template, dest, profile=PageProfile(source, dest, enabled=False))
+        self.assertEqual(profile.stages, {})
+
+    def test_json_report(self):
+        path = os.path.join(self.dir, "report.json")
+        write_report(self.profiles, path)
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(report["pages"], 2)
+        self.assertEqual(set(report["stages"]), set(STAGES))
+        totals = [p["total_s"] for p in report["slowest"]]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+    def test_csv_report(self):
+        path = os.path.join(self.dir, "report.csv")
+        write_report(self.profiles, path)
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({r["source"] for r in rows}, {p.source for p in self.profiles})
+
+    def test_summary_keeps_slowest(self):
+        profiles = []
+        for i in range(5):
+            p = PageProfile(f"{i}.md", f"{i}.html")
+            p.stages["render"] = i / 1000
+            p.bytes_saved = i
+            profiles.append(p)
+        summary = BuildSummary(keep=2)
+        for p in profiles:
+            summary.add(p)
+        self.assertEqual(summary.pages, 5)
+        self.assertEqual(summary.bytes_saved, 10)
+        self.assertEqual(summary.slowest(), [profiles[4], profiles[3]])
+        self.assertEqual(summary.most_saved()[0], (4, "4.html"))
+        self.assertAlmostEqual(summary.stages["render"], 0.010)
+
+
+    def test_page_cache_line(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            print_build_summary(self.profiles)
+            print_build_summary(self.profiles, page_cache=True)
+            print_build_summary([], page_cache=True)
+        lines = [line for line in out.getvalue().splitlines() if line.startswith("Page cache")]
+        self.assertEqual(lines, ["Page cache: 0 of 2 pages reused (0.0% hit rate)",
+                                 "Page cache: 0 of 0 pages reused (0.0% hit rate)"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import argparse
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from fixtures import SiteTestCase
+from server import Watcher, DevHandler, ReloadBroadcaster, inject_reload_script, RELOAD_SCRIPT
+
+
+class TestWatcher(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.dir, "static")
+        self.publish = os.path.join(self.dir, "docs")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        args = argparse.Namespace(basepath="/", jobs=1, link_assets=False, checksum=False)
+        self.watcher = Watcher(args, self.content, self.static, self.template, self.publish, os.path.join(self.dir, "cache"))
+
+    def read(self, *parts):
+        with open(os.path.join(self.publish, *parts)) as f:
+            return f.read()
+
+    def test_only_changed_page_rebuilt(self):
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog 2", bump=1)
+        changed, removed = self.watcher.poll()
+        self.assertEqual(changed, {os.path.join(self.content, "blog", "index.md")})
+        self.assertEqual(self.watcher.rebuild(changed, removed), 1)
+        self.assertEqual(self.read("blog", "index.html"), '<title>Blog 2</title><a href="/">home</a><div><h1>Blog 2</h1></div>')
+        self.assertFalse(os.path.exists(os.path.join(self.publish, "index.html")))
+
+    def test_template_change_rebuilds_all(self):
+        self.write(self.template, "<h6>{{ Title }}</h6>", bump=1)
+        self.watcher.rebuild(*self.watcher.poll())
+        self.assertEqual(self.read("index.html"), "<h6>Home</h6>")
+        self.assertEqual(self.read("blog", "index.html"), "<h6>Blog</h6>")
+
+    def test_static_and_removed(self):
+        self.write(os.path.join(self.static, "index.css"), "body { color: red }", bump=1)
+        self.watcher.rebuild(*self.watcher.poll())
+        self.assertEqual(self.read("index.css"), "body { color: red }")
+        self.watcher.rebuild({os.path.join(self.content, "index.md")}, set())
+        os.remove(os.path.join(self.content, "index.md"))
+        self.watcher.rebuild(*self.watcher.poll())
+        self.assertFalse(os.path.exists(os.path.join(self.publish, "index.html")))
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.poll(), (set(), set()))
+
+
+class _QuietHandler(DevHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestDevHandler(unittest.TestCase):
+    def test_inject(self):
+        self.assertEqual(inject_reload_script(b"<body>x</body>"), b"<body>x" + RELOAD_SCRIPT + b"</body>")
+
+    def test_reload_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "index.html"), "w") as f:
+                f.write("<body>hi</body>")
+            broadcaster = ReloadBroadcaster()
+            handler = partial(_QuietHandler, directory=tmp, broadcaster=broadcaster)
+            httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+            httpd.daemon_threads = True
+            threading.Thread(target=httpd.serve_forever, daemon=True).start()
+            base = f"http://127.0.0.1:{httpd.server_address[1]}"
+            try:
+                with urllib.request.urlopen(base + "/") as response:
+                    self.assertIn(RELOAD_SCRIPT, response.read())
+                with urllib.request.urlopen(base + "/__reload", timeout=5) as events:
+                    threading.Timer(0.1, broadcaster.notify).start()
+                    self.assertEqual(events.readline(), b"data: reload\n")
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import unittest
+
+from fixtures import SiteTestCase
+from main import RenderSettings, generate_page_recursive, walk_pages
+from manifest import Manifest
+from shard import SHARD_MANIFEST, MergeError, merge_shards, parse_shard, read_shards, shard_dir, shard_of, write_shard_manifest
+
+
+class TestPartition(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ["0/4", "5/4", "2", "a/b"]:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(spec)
+
+    def test_stable_and_spread(self):
+        paths = [f"blog/post-{i}/index.md" for i in range(400)]
+        shards = [shard_of(p, 4) for p in paths]
+        self.assertEqual(shards, [shard_of(p, 4) for p in paths])
+        self.assertEqual(set(shards), {1, 2, 3, 4})
+        self.assertGreater(min(shards.count(i) for i in range(1, 5)), 50)
+
+
+class TestMerge(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.shards = os.path.join(self.dir, "shards")
+        self.add_pages([f"p{i}" for i in range(12)])
+
+    def manifest(self, name):
+        return Manifest(os.path.join(self.dir, "cache", name), self.template, "/")
+
+    def build_shards(self, count):
+        for index in range(1, count + 1):
+            publish = shard_dir(index, count, self.shards)
+            manifest = self.manifest(f"{index}-of-{count}.json")
+            generate_page_recursive(self.content, self.template, publish, "/", manifest,
+                                    settings=RenderSettings(self.template, "/"), shard=(index, count))
+            write_shard_manifest(publish, self.content, (index, count), manifest)
+            manifest.save()
+
+    def merge(self, publish, clean=False):
+        return merge_shards(read_shards(self.shards), walk_pages(self.content, publish, make_dirs=False), publish,
+                            self.content, self.manifest("merged.json"), clean=clean)
+
+    def test_merge_matches_plain_build(self):
+        plain = os.path.join(self.dir, "plain")
+        generate_page_recursive(self.content, self.template, plain, "/")
+        self.build_shards(3)
+        merged = os.path.join(self.dir, "docs")
+        self.assertEqual(self.merge(merged), 12)
+        for source, dest in walk_pages(self.content, plain):
+            rel = os.path.relpath(dest, plain)
+            with open(dest) as a, open(os.path.join(merged, rel)) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_overlap_and_missing(self):
+        self.build_shards(2)
+        path = os.path.join(shard_dir(1, 2, self.shards), SHARD_MANIFEST)
+        with open(path) as f:
+            first = json.load(f)
+        with open(os.path.join(shard_dir(2, 2, self.shards), SHARD_MANIFEST)) as f:
+            second = json.load(f)
+        dropped = sorted(first["pages"])[0]
+        stolen = sorted(second["pages"])[0]
+        del first["pages"][dropped]
+        first["pages"][stolen] = second["pages"][stolen]
+        with open(path, "w") as f:
+            json.dump(first, f)
+        with self.assertRaises(MergeError) as cm:
+            self.merge(os.path.join(self.dir, "docs"))
+        message = str(cm.exception)
+        self.assertIn(f"1 pages missing: {dropped}", message)
+        self.assertIn(f"1 pages in more than one shard: {stolen}", message)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "docs", stolen)))
+
+    def test_stale_shard(self):
+        self.build_shards(2)
+        with open(os.path.join(self.content, "p3", "index.md"), "a") as f:
+            f.write("\n\nedited")
+        with self.assertRaises(MergeError) as cm:
+            self.merge(os.path.join(self.dir, "docs"))
+        self.assertIn("older source: p3/index.html", str(cm.exception))
+
+    def test_shard_holds_only_its_pages(self):
+        self.build_shards(3)
+        for index in range(1, 4):
+            publish = shard_dir(index, 3, self.shards)
+            with open(os.path.join(publish, SHARD_MANIFEST)) as f:
+                pages = json.load(f)["pages"]
+            self.assertEqual(sorted(os.listdir(publish)), sorted([SHARD_MANIFEST] + [os.path.dirname(p) for p in pages]))
+
+    def test_refused_merge_leaves_publish_alone(self):
+        merged = os.path.join(self.dir, "docs")
+        self.write(os.path.join(merged, "old.html"), "<p>old</p>")
+        self.build_shards(2)
+        os.remove(os.path.join(shard_dir(2, 2, self.shards), SHARD_MANIFEST))
+        with self.assertRaises(MergeError):
+            self.merge(merged, clean=True)
+        self.assertEqual(os.listdir(merged), ["old.html"])
+        self.build_shards(2)
+        self.assertEqual(self.merge(merged, clean=True), 12)
+        self.assertNotIn("old.html", os.listdir(merged))
+
+    def test_missing_shard(self):
+        self.build_shards(3)
+        os.remove(os.path.join(shard_dir(2, 3, self.shards), SHARD_MANIFEST))
+        with self.assertRaisesRegex(MergeError, "shards 2 of 3 missing"):
+            self.merge(os.path.join(self.dir, "docs"))
+
+
+if __name__ == "__main__":
+    unittest.main()
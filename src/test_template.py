@@ -0,0 +1,93 @@
+import os
+import tempfile
+import time
+import unittest
+
+from assets import AssetMap
+from htmlnode import LeafNode, ParentNode
+from template import Template, Slot, load_template, rewrite_rooted
+
+
+class TestTemplate(unittest.TestCase):
+    def test_compile_segments(self):
+        t = Template.compile("<title>{{ Title }}</title><main>{{Content}}</main>")
+        self.assertEqual(t.segments, ["<title>", Slot("Title", ""), "</title><main>", Slot("Content", ""), "</main>"])
+
+    def test_render(self):
+        t = Template.compile("<h1>{{ Title }}</h1>{{ Content }}{{ Title }}")
+        self.assertEqual(t.render({"Title": "Hi", "Content": "<p>x</p>"}), "<h1>Hi</h1><p>x</p>Hi")
+
+    def test_unknown_placeholder_left_alone(self):
+        t = Template.compile("{{ Title }} {{ Author }}")
+        self.assertEqual(t.render({"Title": "Hi"}), "Hi {{ Author }}")
+
+    def test_basepath(self):
+        t = Template.compile('<link href="/index.css" />{{ Content }}', "/ssg/")
+        html = t.render({"Content": '<img src="/a.png" alt="a">'})
+        self.assertEqual(html, '<link href="/ssg/index.css" /><img src="/ssg/a.png" alt="a">')
+
+    def test_digest(self):
+        text = '<a href="/">{{ Title }}</a>{{ Content }}'
+        self.assertEqual(Template.compile(text).digest, Template.compile(text).digest)
+        self.assertNotEqual(Template.compile(text).digest, Template.compile(text, "/ssg/").digest)
+        self.assertNotEqual(Template.compile(text).digest, Template.compile(text + " ").digest)
+
+    def test_render_to_node(self):
+        t = Template.compile("<main>{{ Content }}</main>", "/ssg/")
+        node = ParentNode("p", [LeafNode("a", "home", {"href": "/"})])
+        fragments = []
+        t.render_to(fragments, {"Content": node})
+        self.assertEqual("".join(fragments), '<main><p><a href="/ssg/">home</a></p></main>')
+
+    def test_fingerprinted_assets(self):
+        amap = AssetMap({"/index.css": "/index.0123abcd.css", "/a.png": "/a.4567ef01.png"})
+        t = Template.compile('<link href="/index.css?v=1" /><a href="/">{{ Content }}</a>', "/ssg/", assets=amap)
+        html = t.render({"Content": '<img src="/a.png" alt="a"><img src="/b.png">'})
+        self.assertEqual(html, '<link href="/ssg/index.0123abcd.css?v=1" /><a href="/ssg/">'
+                               '<img src="/ssg/a.4567ef01.png" alt="a"><img src="/ssg/b.png"></a>')
+
+    def test_rewrite_rooted_default_basepath(self):
+        html = '<a href="/x">'
+        self.assertIs(rewrite_rooted(html, "/"), html)
+
+
+class TestPartials(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_partial_inlined(self):
+        self.write("partials/nav.html", '<nav><a href="/">{{ Title }}</a></nav>')
+        path = self.write("page.html", "{{> partials/nav.html }}<main>{{ Content }}</main>")
+        t = load_template(path, "/ssg/")
+        self.assertEqual(t.render({"Title": "T", "Content": "C"}), '<nav><a href="/ssg/">T</a></nav><main>C</main>')
+        self.assertEqual(len(t.dependencies), 2)
+
+    def test_include_cycle(self):
+        self.write("a.html", "{{> b.html }}")
+        path = self.write("b.html", "{{> a.html }}")
+        with self.assertRaises(Exception):
+            load_template(path)
+
+    def test_cache_reloads_on_change(self):
+        self.write("nav.html", "one")
+        path = self.write("page.html", "{{> nav.html }}")
+        first = load_template(path)
+        self.assertIs(load_template(path), first)
+        time.sleep(0.01)
+        self.write("nav.html", "two!")
+        self.assertEqual(load_template(path).render({}), "two!")
+
+
+if __name__ == "__main__":
+    unittest.main()